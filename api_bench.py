@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+Asyncio HTTP benchmark for the bulletin-board API.
+
+Logs in accounts created by seed_data.py (the bulk load-test users, or the
+sample users), keeps one cookie session per account and drives a weighted
+mix of operations against a running server for a fixed duration:
+
+    feed     GET /api/messages at random limit/offset
+    cursor   GET /api/messages?cursor=... following nextCursor for a few pages
+    post     POST /api/messages
+    delete   DELETE /api/messages/:id of a message the account posted
+    profile  PUT /api/profile
+    admin    GET /api/admin/users as the seeded admin
+
+Latencies are recorded in HDR-style log-linear histograms (three
+significant digits), and per-operation throughput, error rates and
+histograms are saved as JSON so runs can be compared across commits and
+dataset sizes. Messages posted by the run are deleted at the end unless
+--keep is given.
+
+Usage:
+    python api_bench.py [--base-url http://localhost:5000] [--users 50]
+                        [--concurrency 32] [--duration 30]
+                        [--mix feed=60,cursor=10,post=10,delete=5,profile=10,admin=5]
+                        [--output results.json]
+"""
+
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+import aiohttp
+from seed_data import SEED_PASSWORD, bulk_username
+
+DEFAULT_BASE_URL = 'http://localhost:5000'
+DEFAULT_MIX = 'feed=60,cursor=10,post=10,delete=5,profile=10,admin=5'
+DEFAULT_LIMITS = '10,20,50'
+DEFAULT_MAX_OFFSET = 1000
+DEFAULT_CONCURRENCY = 32
+DEFAULT_DURATION = 30
+
+# Accounts seed_data.py creates without --bulk
+SAMPLE_USERS = ['bob', 'alice', 'canary']
+ADMIN_USER = 'admin'
+
+# Pages followed per cursor operation
+CURSOR_PAGES = 5
+
+# Logins are bcrypt-bound on the server; keep them from swamping it
+LOGIN_CONCURRENCY = 8
+
+# Values below 2**SUB_BUCKET_BITS microseconds are recorded exactly; above
+# that every bucket spans 1/2**SUB_BUCKET_BITS of its value
+SUB_BUCKET_BITS = 11
+
+class LatencyHistogram:
+    """HDR-style histogram of latencies in microseconds.
+
+    Buckets are log-linear, so relative error stays below 0.1% from
+    microseconds to minutes, and histograms from different runs can be
+    merged by adding counts.
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+        self.total = 0
+        self.sum = 0
+        self.max = 0
+
+    @staticmethod
+    def bucket(value):
+        shift = max(value.bit_length() - SUB_BUCKET_BITS, 0)
+        return (value >> shift) << shift
+
+    def record(self, seconds):
+        value = max(int(seconds * 1_000_000), 1)
+        self.counts[self.bucket(value)] += 1
+        self.total += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, percent):
+        if not self.total:
+            return 0
+        target = self.total * percent / 100
+        seen = 0
+        for value in sorted(self.counts):
+            seen += self.counts[value]
+            if seen >= target:
+                return value
+        return self.max
+
+    def to_dict(self):
+        return {
+            'unit': 'us',
+            'count': self.total,
+            'mean': self.sum / self.total if self.total else 0,
+            'max': self.max,
+            'percentiles': {str(p): self.percentile(p) for p in (50, 90, 99, 99.9, 99.99)},
+            # Sparse bucket lower bounds -> counts, mergeable across runs
+            'buckets': {str(value): count for value, count in sorted(self.counts.items())},
+        }
+
+class OperationStats:
+    """Latency histogram plus outcome counts for one operation."""
+
+    def __init__(self):
+        self.histogram = LatencyHistogram()
+        self.errors = Counter()
+
+    def to_dict(self, elapsed):
+        requests = self.histogram.total + sum(self.errors.values())
+        return {
+            'requests': requests,
+            'throughput': requests / elapsed,
+            'errors': dict(self.errors),
+            'error_rate': sum(self.errors.values()) / requests if requests else 0,
+            'latency': self.histogram.to_dict(),
+        }
+
+def parse_mix(value):
+    """Parse 'feed=60,post=10' into {'feed': 60, 'post': 10}."""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(
+                f"Unknown operation '{name}'. Choose from: {', '.join(OPERATIONS)}")
+        mix[name] = float(weight)
+    return mix
+
+class Client:
+    """One logged-in account with its own cookie session."""
+
+    def __init__(self, base_url, username, timeout):
+        self.base_url = base_url
+        self.username = username
+        # unsafe=True keeps cookies for hosts given as IP addresses
+        self.session = aiohttp.ClientSession(
+            cookie_jar=aiohttp.CookieJar(unsafe=True),
+            timeout=aiohttp.ClientTimeout(total=timeout),
+        )
+        self.posted = []
+
+    async def request(self, method, path, **kwargs):
+        """Send one request; returns (status, parsed JSON body or None)."""
+        async with self.session.request(method, self.base_url + path, **kwargs) as response:
+            body = await response.read()
+            try:
+                data = json.loads(body) if body else None
+            except ValueError:
+                data = None
+            return response.status, data
+
+    async def login(self):
+        status, _ = await self.request('POST', '/api/login', json={
+            'username': self.username,
+            'password': SEED_PASSWORD,
+        })
+        return status == 200
+
+    async def close(self):
+        await self.session.close()
+
+async def timed(stats, name, call):
+    """Run one request, recording latency on success and the status otherwise."""
+    started = time.perf_counter()
+    try:
+        status, data = await call
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        stats[name].errors[type(e).__name__] += 1
+        return None
+    if status >= 400:
+        stats[name].errors[str(status)] += 1
+        return None
+    stats[name].histogram.record(time.perf_counter() - started)
+    return data
+
+async def op_feed(client, stats, args, rng):
+    limit = rng.choice(args.limits)
+    offset = rng.randrange(0, args.max_offset + 1, limit)
+    await timed(stats, 'feed', client.request(
+        'GET', '/api/messages', params={'limit': limit, 'offset': offset}))
+
+async def op_cursor(client, stats, args, rng):
+    limit = rng.choice(args.limits)
+    cursor = ''
+    for _ in range(CURSOR_PAGES):
+        data = await timed(stats, 'cursor', client.request(
+            'GET', '/api/messages', params={'limit': limit, 'cursor': cursor}))
+        if not data or not data.get('nextCursor'):
+            return
+        cursor = data['nextCursor']
+
+async def op_post(client, stats, args, rng):
+    data = await timed(stats, 'post', client.request('POST', '/api/messages', json={
+        'content': f"api_bench post {rng.getrandbits(32):08x} from {client.username}",
+    }))
+    if data and 'id' in data:
+        client.posted.append(data['id'])
+
+async def op_delete(client, stats, args, rng):
+    if not client.posted:
+        # Nothing of ours to delete yet; post instead so the mix stays balanced
+        await op_post(client, stats, args, rng)
+        return
+    message_id = client.posted.pop(rng.randrange(len(client.posted)))
+    await timed(stats, 'delete', client.request('DELETE', f'/api/messages/{message_id}'))
+
+async def op_profile(client, stats, args, rng):
+    await timed(stats, 'profile', client.request('PUT', '/api/profile', json={
+        'firstName': f"Bench{rng.randrange(1000)}",
+    }))
+
+async def op_admin(client, stats, args, rng):
+    await timed(stats, 'admin', args.admin_client.request('GET', '/api/admin/users'))
+
+OPERATIONS = {
+    'feed': op_feed,
+    'cursor': op_cursor,
+    'post': op_post,
+    'delete': op_delete,
+    'profile': op_profile,
+    'admin': op_admin,
+}
+
+async def login_all(base_url, usernames, timeout):
+    """Log in every account, returning the clients that succeeded."""
+    semaphore = asyncio.Semaphore(LOGIN_CONCURRENCY)
+
+    async def login(username):
+        client = Client(base_url, username, timeout)
+        async with semaphore:
+            try:
+                if await client.login():
+                    return client
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                pass
+        await client.close()
+        return None
+
+    clients = await asyncio.gather(*(login(username) for username in usernames))
+    return [client for client in clients if client]
+
+async def worker(worker_id, clients, stats, args, deadline):
+    """Closed loop: pick an operation by weight and run it until the deadline."""
+    rng = random.Random(None if args.seed is None else args.seed + worker_id)
+    names = list(args.mix)
+    weights = [args.mix[name] for name in names]
+    client = clients[worker_id % len(clients)]
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        await OPERATIONS[name](client, stats, args, rng)
+
+async def cleanup(clients):
+    """Delete messages the run posted and has not deleted yet."""
+    semaphore = asyncio.Semaphore(LOGIN_CONCURRENCY)
+
+    async def delete(client, message_id):
+        async with semaphore:
+            try:
+                await client.request('DELETE', f'/api/messages/{message_id}')
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                pass
+
+    pending = [(client, message_id) for client in clients for message_id in client.posted]
+    await asyncio.gather(*(delete(client, message_id) for client, message_id in pending))
+    return len(pending)
+
+def git_revision():
+    """Current commit, so results can be compared across commits."""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def run(args):
+    """Log in, run the mix, clean up and return the results dict."""
+    if args.users:
+        usernames = [bulk_username(args.user_prefix, index) for index in range(1, args.users + 1)]
+    else:
+        usernames = SAMPLE_USERS
+
+    print(f"Logging in {len(usernames)} accounts...")
+    started = time.perf_counter()
+    clients = await login_all(args.base_url, usernames, args.timeout)
+    print(f"  {len(clients)} logged in ({len(usernames) - len(clients)} failed) "
+          f"in {time.perf_counter() - started:.1f}s")
+    if not clients:
+        print("Error: no account could log in. Is the server running and the database seeded?")
+        sys.exit(1)
+
+    args.admin_client = None
+    if args.mix.get('admin'):
+        admins = await login_all(args.base_url, [ADMIN_USER], args.timeout)
+        if not admins:
+            print(f"Warning: could not log in as {ADMIN_USER}; skipping admin operations")
+            del args.mix['admin']
+        else:
+            args.admin_client = admins[0]
+
+    try:
+        # Dataset size the numbers were measured against
+        _, first_page = await clients[0].request('GET', '/api/messages', params={'limit': 1})
+        total_messages = (first_page or {}).get('totalCount')
+
+        stats = defaultdict(OperationStats)
+        print(f"Running {args.concurrency} workers for {args.duration:g}s "
+              f"against {total_messages} messages...")
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(worker(worker_id, clients, stats, args, deadline)
+                               for worker_id in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+        if not args.keep:
+            removed = await cleanup(clients)
+            print(f"Deleted {removed:,} messages posted during the run")
+    finally:
+        for client in clients + ([args.admin_client] if args.admin_client else []):
+            await client.close()
+
+    return {
+        'meta': {
+            'started_at': datetime.now(timezone.utc).isoformat(),
+            'git_revision': git_revision(),
+            'base_url': args.base_url,
+            'accounts': len(clients),
+            'concurrency': args.concurrency,
+            'duration': elapsed,
+            'mix': args.mix,
+            'limits': args.limits,
+            'max_offset': args.max_offset,
+            'total_messages': total_messages,
+        },
+        'operations': {name: op.to_dict(elapsed) for name, op in stats.items()},
+    }
+
+def main():
+    """Parse command-line options and run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark the bulletin-board HTTP API.")
+    parser.add_argument('--base-url', default=DEFAULT_BASE_URL,
+                        help=f"server to test (default: {DEFAULT_BASE_URL})")
+    parser.add_argument('--users', type=int, default=0,
+                        help="bulk accounts to log in; 0 uses the sample users (default: 0)")
+    parser.add_argument('--user-prefix', default='loadtest',
+                        help="username prefix the bulk users were seeded with (default: loadtest)")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"concurrent request loops (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION,
+                        help=f"seconds to run (default: {DEFAULT_DURATION})")
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help=f"operation weights (default: {DEFAULT_MIX})")
+    parser.add_argument('--limits', type=lambda v: [int(x) for x in v.split(',')],
+                        default=DEFAULT_LIMITS,
+                        help=f"feed page sizes to choose from (default: {DEFAULT_LIMITS})")
+    parser.add_argument('--max-offset', type=int, default=DEFAULT_MAX_OFFSET,
+                        help=f"largest feed offset requested (default: {DEFAULT_MAX_OFFSET})")
+    parser.add_argument('--timeout', type=float, default=30,
+                        help="per-request timeout in seconds (default: 30)")
+    parser.add_argument('--seed', type=int, help="random seed for a reproducible request sequence")
+    parser.add_argument('--output', help="write results as JSON to this file")
+    parser.add_argument('--keep', action='store_true',
+                        help="keep messages posted during the run")
+    args = parser.parse_args()
+
+    print("API Benchmark")
+    print("=" * 40)
+
+    results = asyncio.run(run(args))
+
+    print(f"{'operation':<10} {'requests':>9} {'req/s':>8} {'errors':>7} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, op in results['operations'].items():
+        latency = op['latency']
+        print(f"{name:<10} {op['requests']:>9,} {op['throughput']:>8,.1f} "
+              f"{op['error_rate']:>7.1%} {latency['percentiles']['50'] / 1000:>8.2f} "
+              f"{latency['percentiles']['99'] / 1000:>8.2f} {latency['max'] / 1000:>8.2f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
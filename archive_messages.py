@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Streaming archival export of old messages.
+
+Messages (with their author's username) are read through a server-side
+cursor with a fixed fetch size and written as gzip-compressed JSON Lines,
+partitioned by day:
+
+    ARCHIVE/date=2025-01-03/part-0000.jsonl.gz
+    ARCHIVE/manifest.json
+
+The manifest records row counts and SHA-256 checksums for every file plus
+a high-water mark, so repeated runs only archive messages newer than the
+last one, and reading a single day opens only that day's files. Run it
+before retention.py and pass the archive to retention's --archive, which
+never deletes past the high-water mark.
+
+Usage:
+    python archive_messages.py export ARCHIVE --days 365
+    python archive_messages.py read ARCHIVE 2025-01-03
+    python archive_messages.py verify ARCHIVE
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import hashlib
+import argparse
+from datetime import datetime, timedelta
+import psycopg2
+from db_session import DatabaseSession, close_pool
+
+# Rows fetched from the server per round trip
+DEFAULT_FETCH_SIZE = 5000
+
+# Rows per part file before rolling over to the next one
+DEFAULT_ROWS_PER_FILE = 200_000
+
+MANIFEST_NAME = 'manifest.json'
+
+def load_manifest(archive_dir):
+    """Load the archive manifest, or start an empty one."""
+    path = os.path.join(archive_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {'partitions': {}, 'high_water': None}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_manifest(archive_dir, manifest):
+    """Atomically write the manifest."""
+    path = os.path.join(archive_dir, MANIFEST_NAME)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+class PartitionWriter:
+    """Writes rows into rolling part files, one day partition at a time.
+
+    The manifest is updated and saved each time a file is closed, so it
+    only ever lists complete files.
+    """
+
+    def __init__(self, archive_dir, manifest, rows_per_file):
+        self.archive_dir = archive_dir
+        self.manifest = manifest
+        self.rows_per_file = rows_per_file
+        self.day = None
+        self.file = None
+        self.entry = None
+        self.digest = None
+        self.last_key = None
+
+    def _open(self, day):
+        files = self.manifest['partitions'].setdefault(day, [])
+        name = os.path.join(f"date={day}", f"part-{len(files):04d}.jsonl.gz")
+        os.makedirs(os.path.join(self.archive_dir, f"date={day}"), exist_ok=True)
+        self.file = gzip.open(os.path.join(self.archive_dir, name), 'wb')
+        self.entry = {'file': name, 'rows': 0}
+        self.digest = hashlib.sha256()
+        self.day = day
+
+    def close(self):
+        if self.file is None:
+            return
+        self.file.close()
+        self.entry['sha256'] = self.digest.hexdigest()
+        self.manifest['partitions'][self.day].append(self.entry)
+        self.manifest['high_water'] = self.last_key
+        save_manifest(self.archive_dir, self.manifest)
+        self.file = None
+
+    def write(self, row):
+        day = row['timestamp'][:10]
+        if self.file is not None and (day != self.day or self.entry['rows'] >= self.rows_per_file):
+            self.close()
+        if self.file is None:
+            self._open(day)
+        line = (json.dumps(row, ensure_ascii=False) + '\n').encode('utf-8')
+        self.file.write(line)
+        self.digest.update(line)
+        self.entry['rows'] += 1
+        self.last_key = [row['timestamp'], row['id']]
+
+def export_archive(session, archive_dir, days, fetch_size=DEFAULT_FETCH_SIZE,
+                   rows_per_file=DEFAULT_ROWS_PER_FILE):
+    """Archive messages older than days that are past the high-water mark."""
+    os.makedirs(archive_dir, exist_ok=True)
+    manifest = load_manifest(archive_dir)
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    high_water = manifest['high_water'] or [None, 0]
+
+    session.cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+    cur = session.conn.cursor('archive_messages')
+    cur.itersize = fetch_size
+    cur.execute("""
+        SELECT m.id, m.user_id, u.username, m.timestamp, m.content
+        FROM messages m
+        JOIN users u ON u.id = m.user_id
+        WHERE m.timestamp < %(cutoff)s
+        AND (%(last_timestamp)s::timestamp IS NULL
+             OR (m.timestamp, m.id) > (%(last_timestamp)s::timestamp, %(last_id)s))
+        ORDER BY m.timestamp, m.id
+    """, {'cutoff': cutoff, 'last_timestamp': high_water[0], 'last_id': high_water[1]})
+
+    started = time.perf_counter()
+    writer = PartitionWriter(archive_dir, manifest, rows_per_file)
+    total = 0
+    try:
+        for message_id, user_id, username, timestamp, content in cur:
+            writer.write({
+                'id': message_id,
+                'user_id': user_id,
+                'username': username,
+                'timestamp': timestamp.isoformat(sep=' '),
+                'content': content,
+            })
+            total += 1
+            if total % (fetch_size * 20) == 0:
+                elapsed = time.perf_counter() - started
+                print(f"  archived {total:,} ({total / max(elapsed, 1e-9):,.0f} rows/sec)")
+    finally:
+        writer.close()
+        cur.close()
+
+    print(f"Archived {total:,} messages older than {cutoff:%Y-%m-%d %H:%M:%S} "
+          f"in {time.perf_counter() - started:.1f}s")
+
+def read_file(archive_dir, entry):
+    """Yield rows from one part file, verifying its row count and checksum."""
+    digest = hashlib.sha256()
+    rows = 0
+    with gzip.open(os.path.join(archive_dir, entry['file']), 'rb') as f:
+        for line in f:
+            digest.update(line)
+            rows += 1
+            yield json.loads(line)
+    if rows != entry['rows'] or digest.hexdigest() != entry['sha256']:
+        raise ValueError(f"Archive file {entry['file']} does not match the manifest")
+
+def read_partition(archive_dir, day):
+    """Yield the archived rows of one day, opening only that day's files."""
+    manifest = load_manifest(archive_dir)
+    for entry in manifest['partitions'].get(day, []):
+        yield from read_file(archive_dir, entry)
+
+def verify_archive(archive_dir):
+    """Check every file in the archive against the manifest."""
+    manifest = load_manifest(archive_dir)
+    total = 0
+    for day in sorted(manifest['partitions']):
+        for entry in manifest['partitions'][day]:
+            total += sum(1 for _ in read_file(archive_dir, entry))
+    print(f"Verified {total:,} rows in {len(manifest['partitions'])} daily partitions")
+
+def main():
+    """Parse command-line options and run the requested command."""
+    parser = argparse.ArgumentParser(description="Archive old messages to compressed JSONL files.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export = commands.add_parser('export', help="archive messages older than --days")
+    export.add_argument('archive')
+    export.add_argument('--days', type=int, required=True,
+                        help="archive messages older than this many days")
+    export.add_argument('--fetch-size', type=int, default=DEFAULT_FETCH_SIZE,
+                        help=f"rows fetched per round trip (default: {DEFAULT_FETCH_SIZE})")
+    export.add_argument('--rows-per-file', type=int, default=DEFAULT_ROWS_PER_FILE,
+                        help=f"rows per part file (default: {DEFAULT_ROWS_PER_FILE})")
+
+    read = commands.add_parser('read', help="print one day's archived messages as JSONL")
+    read.add_argument('archive')
+    read.add_argument('day', help="YYYY-MM-DD")
+
+    verify = commands.add_parser('verify', help="check archive files against the manifest")
+    verify.add_argument('archive')
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'export':
+            with DatabaseSession() as session:
+                export_archive(session, args.archive, args.days,
+                               args.fetch_size, args.rows_per_file)
+        elif args.command == 'read':
+            for row in read_partition(args.archive, args.day):
+                print(json.dumps(row, ensure_ascii=False))
+        else:
+            verify_archive(args.archive)
+    except psycopg2.Error as e:
+        print(f"Database error: {e}")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"Archive error: {e}")
+        sys.exit(1)
+    finally:
+        close_pool()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Garbage collector for orphaned files in the avatars/ directory.
+
+Avatar files are only removed when a user successfully changes their
+avatar, so files of deleted users and failed updates pile up. This tool
+streams the referenced users.avatar_url values from the database, walks
+the directory lazily with os.scandir and deletes unreferenced files older
+than a grace period (which protects uploads that have not been saved to
+the database yet) on a thread pool.
+
+Usage:
+    python avatar_gc.py [--dir avatars] [--grace-hours 24] [--workers 8] [--dry-run]
+"""
+
+import os
+import sys
+import time
+import argparse
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+import psycopg2
+from db_session import DatabaseSession, close_pool
+
+# Default location, matching AVATAR_DIR in server/avatarUtils.ts
+DEFAULT_AVATAR_DIR = 'avatars'
+
+# Files younger than this are never deleted
+DEFAULT_GRACE_HOURS = 24
+
+# Threads issuing unlink calls
+DEFAULT_WORKERS = 8
+
+# Candidate files handed to the pool at a time
+DELETE_BATCH_SIZE = 1000
+
+# Rows fetched per round trip while streaming avatar URLs
+FETCH_SIZE = 10_000
+
+def referenced_avatars(session):
+    """Return the set of avatar file names still referenced by users."""
+    referenced = set()
+    cur = session.conn.cursor('avatar_urls')
+    try:
+        cur.itersize = FETCH_SIZE
+        cur.execute("""
+            SELECT avatar_url FROM users
+            WHERE avatar_url LIKE '/avatars/%'
+        """)
+        for (avatar_url,) in cur:
+            referenced.add(os.path.basename(avatar_url))
+    finally:
+        cur.close()
+    return referenced
+
+def orphaned_files(avatar_dir, referenced, cutoff, stats):
+    """Yield (path, size) for unreferenced files last modified before cutoff."""
+    with os.scandir(avatar_dir) as entries:
+        for entry in entries:
+            if entry.name.startswith('.') or not entry.is_file(follow_symlinks=False):
+                continue
+            stats['scanned'] += 1
+            if entry.name in referenced:
+                continue
+            info = entry.stat(follow_symlinks=False)
+            if info.st_mtime >= cutoff:
+                stats['too_recent'] += 1
+                continue
+            yield entry.path, info.st_size
+
+def remove_file(path):
+    """Delete one file, returning False if it was already gone."""
+    try:
+        os.unlink(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+def collect(avatar_dir, referenced, grace_hours=DEFAULT_GRACE_HOURS,
+            workers=DEFAULT_WORKERS, dry_run=False):
+    """Delete (or with dry_run, just count) orphaned avatar files."""
+    cutoff = time.time() - grace_hours * 3600
+    stats = {'scanned': 0, 'too_recent': 0, 'deleted': 0, 'bytes': 0}
+    candidates = orphaned_files(avatar_dir, referenced, cutoff, stats)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            batch = list(islice(candidates, DELETE_BATCH_SIZE))
+            if not batch:
+                break
+            if dry_run:
+                results = [True] * len(batch)
+            else:
+                results = executor.map(remove_file, [path for path, _ in batch])
+            for (_, size), removed in zip(batch, results):
+                if removed:
+                    stats['deleted'] += 1
+                    stats['bytes'] += size
+
+    return stats
+
+def main():
+    """Parse command-line options and run the collector."""
+    parser = argparse.ArgumentParser(description="Delete avatar files no user references.")
+    parser.add_argument('--dir', default=DEFAULT_AVATAR_DIR,
+                        help=f"avatar directory (default: {DEFAULT_AVATAR_DIR})")
+    parser.add_argument('--grace-hours', type=float, default=DEFAULT_GRACE_HOURS,
+                        help=f"keep files younger than this (default: {DEFAULT_GRACE_HOURS})")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f"parallel delete threads (default: {DEFAULT_WORKERS})")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="report what would be deleted without deleting")
+    args = parser.parse_args()
+
+    print("Avatar Garbage Collector")
+    print("=" * 40)
+
+    if not os.path.isdir(args.dir):
+        print(f"Avatar directory {args.dir} not found, nothing to do")
+        return
+
+    try:
+        with DatabaseSession() as session:
+            referenced = referenced_avatars(session)
+    except psycopg2.Error as e:
+        print(f"Database error: {e}")
+        sys.exit(1)
+    finally:
+        close_pool()
+
+    started = time.perf_counter()
+    stats = collect(args.dir, referenced, args.grace_hours, args.workers, args.dry_run)
+    action = "Would delete" if args.dry_run else "Deleted"
+    print(f"Scanned {stats['scanned']:,} files, {len(referenced):,} referenced, "
+          f"{stats['too_recent']:,} orphans inside the grace period")
+    print(f"{action} {stats['deleted']:,} files, reclaiming {stats['bytes'] / 1e6:,.1f} MB "
+          f"in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -2,84 +2,196 @@
 """
 Cleanup script to remove all users and messages from the Beta BSS database.
 WARNING: This will permanently delete all data!
+
+Pass --metrics PATH for per-phase timings as JSON and --cprofile-dir DIR to
+profile each phase (see instrumentation.py).
 """
 
-import os
 import sys
+import time
+import argparse
 import psycopg2
-from psycopg2 import sql
-
-def get_database_url():
-    """Get database URL from environment variables."""
-    database_url = os.getenv('DATABASE_URL')
-    if not database_url:
-        print("Error: DATABASE_URL environment variable not found")
-        print("Make sure you're running this in the same environment as your app")
-        sys.exit(1)
-    return database_url
+from db_session import DatabaseSession, close_pool, get_pool
+import instrumentation
+from instrumentation import phase
+
+# Rows removed per transaction in chunked mode
+DEFAULT_BATCH_SIZE = 5000
+
+# Seconds to sleep between chunked-mode batches
+DEFAULT_PAUSE = 0.1
 
-def cleanup_database():
+def estimate_row_counts(cur):
+    """Return planner row estimates for users and messages without scanning."""
+    cur.execute("""
+        SELECT relname, GREATEST(reltuples, 0)::bigint
+        FROM pg_class
+        WHERE relname IN ('users', 'messages')
+        AND relkind = 'r'
+        AND relnamespace = 'public'::regnamespace
+    """)
+    return dict(cur.fetchall())
+
+def reset_message_identity(cur):
+    """Restart the messages.id identity column at 1."""
+    with phase('reset identity'):
+        cur.execute("ALTER TABLE messages ALTER COLUMN id RESTART WITH 1")
+    print("Reset messages ID identity")
+
+def cleanup_database(session):
     """Remove all messages and users from the database."""
-    database_url = get_database_url()
+    cur = session.cur
     
     try:
-        # Connect to database
-        conn = psycopg2.connect(database_url)
-        cur = conn.cursor()
-        
         print("Cleaning up database...")
         
-        # Count existing records before deletion
-        cur.execute("SELECT COUNT(*) FROM messages")
-        message_count = cur.fetchone()[0]
-        
-        cur.execute("SELECT COUNT(*) FROM users")
-        user_count = cur.fetchone()[0]
-        
-        print(f"Found {message_count} messages and {user_count} users")
+        cur.execute("""
+            SELECT EXISTS (SELECT 1 FROM messages), EXISTS (SELECT 1 FROM users)
+        """)
+        has_messages, has_users = cur.fetchone()
         
-        if message_count == 0 and user_count == 0:
+        if not has_messages and not has_users:
             print("Database is already clean!")
             return
         
         # Delete all messages first (due to foreign key constraints)
-        cur.execute("DELETE FROM messages")
-        print(f"Deleted {message_count} messages")
+        with phase('delete messages') as timed:
+            cur.execute("DELETE FROM messages")
+            timed.rows = cur.rowcount
+        print(f"Deleted {cur.rowcount} messages")
         
         # Delete all users
-        cur.execute("DELETE FROM users")
-        print(f"Deleted {user_count} users")
+        with phase('delete users') as timed:
+            cur.execute("DELETE FROM users")
+            timed.rows = cur.rowcount
+        print(f"Deleted {cur.rowcount} users")
         
-        # Reset auto-increment sequences
-        cur.execute("ALTER SEQUENCE messages_id_seq RESTART WITH 1")
-        print("Reset messages ID sequence")
+        reset_message_identity(cur)
         
         # Commit the changes
-        conn.commit()
+        session.checkpoint()
         print("Database cleanup completed successfully!")
         
     except psycopg2.Error as e:
         print(f"Database error: {e}")
-        if conn:
-            conn.rollback()
         sys.exit(1)
-    except Exception as e:
-        print(f"Unexpected error: {e}")
+
+def truncate_database(session):
+    """Empty users and messages with TRUNCATE for disposable environments.
+
+    Takes an ACCESS EXCLUSIVE lock on both tables for the (short) duration
+    of the TRUNCATE, writes almost no WAL and restarts the identity column.
+    """
+    cur = session.cur
+    
+    try:
+        estimates = estimate_row_counts(cur)
+        print(f"Truncating about {estimates.get('messages', 0):,} messages "
+              f"and {estimates.get('users', 0):,} users...")
+        
+        with phase('truncate') as timed:
+            cur.execute("TRUNCATE messages, users RESTART IDENTITY CASCADE")
+            session.checkpoint()
+            # TRUNCATE reports no row count, so fall back to the estimate
+            timed.rows = sum(estimates.values())
+        print("Database truncated successfully!")
+        
+    except psycopg2.Error as e:
+        print(f"Database error: {e}")
         sys.exit(1)
-    finally:
-        if cur:
-            cur.close()
-        if conn:
-            conn.close()
 
-def verify_database_structure():
-    """Verify that the required tables exist."""
-    database_url = get_database_url()
+def delete_in_batches(session, label, statement, first_key, batch_size, pause):
+    """Run a keyed batch DELETE until it removes nothing, one commit per batch.
+
+    statement takes (last_key, batch_size) and must return the deleted keys.
+    Keys are walked in ascending order from first_key, so each batch starts
+    from an index seek instead of rescanning rows already deleted.
+    """
+    cur = session.cur
+    last_key = first_key
+    total = 0
+    started = time.perf_counter()
+    
+    while True:
+        cur.execute(statement, (last_key, batch_size))
+        keys = [row[0] for row in cur.fetchall()]
+        session.checkpoint()
+        
+        if not keys:
+            break
+        
+        total += len(keys)
+        last_key = max(keys)
+        elapsed = time.perf_counter() - started
+        print(f"  {label}: deleted {total:,} ({total / max(elapsed, 1e-9):,.0f} rows/sec)")
+        
+        if pause:
+            time.sleep(pause)
+    
+    return total
+
+def chunked_cleanup(session, batch_size=DEFAULT_BATCH_SIZE, pause=DEFAULT_PAUSE):
+    """Delete all messages and users in short keyed batches.
+
+    Meant for shared environments: every batch is its own transaction, so
+    locks are held only briefly and the live server keeps running. Each user
+    batch also removes any messages those users posted in the meantime.
+    """
+    cur = session.cur
     
     try:
-        conn = psycopg2.connect(database_url)
-        cur = conn.cursor()
+        estimates = estimate_row_counts(cur)
+        print(f"Deleting about {estimates.get('messages', 0):,} messages "
+              f"and {estimates.get('users', 0):,} users "
+              f"in batches of {batch_size:,}...")
+        session.checkpoint()
+        
+        with phase('delete messages') as timed:
+            message_total = timed.rows = delete_in_batches(session, 'messages', """
+                DELETE FROM messages
+                WHERE id IN (
+                    SELECT id FROM messages
+                    WHERE id > %s
+                    ORDER BY id
+                    LIMIT %s
+                )
+                RETURNING id
+            """, 0, batch_size, pause)
+        
+        with phase('delete users') as timed:
+            user_total = timed.rows = delete_in_batches(session, 'users', """
+                WITH batch AS (
+                    SELECT id FROM users
+                    WHERE id > %s
+                    ORDER BY id
+                    LIMIT %s
+                ), stragglers AS (
+                    DELETE FROM messages
+                    WHERE user_id IN (SELECT id FROM batch)
+                )
+                DELETE FROM users
+                WHERE id IN (SELECT id FROM batch)
+                RETURNING id
+            """, '', batch_size, pause)
         
+        print(f"Deleted {message_total:,} messages and {user_total:,} users")
+        
+        # Only restart numbering once nothing is left to collide with
+        cur.execute("SELECT NOT EXISTS (SELECT 1 FROM messages)")
+        if cur.fetchone()[0]:
+            reset_message_identity(cur)
+        session.checkpoint()
+        print("Database cleanup completed successfully!")
+        
+    except psycopg2.Error as e:
+        print(f"Database error: {e}")
+        sys.exit(1)
+
+def verify_database_structure(session):
+    """Verify that the required tables exist."""
+    cur = session.cur
+    
+    try:
         # Check if required tables exist
         cur.execute("""
             SELECT table_name 
@@ -104,54 +216,80 @@ def verify_database_structure():
     except psycopg2.Error as e:
         print(f"Database error while verifying structure: {e}")
         return False
-    except Exception as e:
-        print(f"Unexpected error while verifying structure: {e}")
-        return False
-    finally:
-        if cur:
-            cur.close()
-        if conn:
-            conn.close()
+
+def run_cleanup(session, mode, batch_size, pause):
+    """Dispatch to the cleanup implementation for the chosen mode."""
+    if mode == 'truncate':
+        truncate_database(session)
+    elif mode == 'chunked':
+        chunked_cleanup(session, batch_size, pause)
+    else:
+        cleanup_database(session)
 
 def cleanup_all():
     """Main function to clean up all data."""
+    parser = argparse.ArgumentParser(description="Remove all users and messages from the database.")
+    parser.add_argument('confirm', nargs='?', choices=['/delete_all'],
+                        help="skip the interactive confirmation")
+    parser.add_argument('--mode', choices=['delete', 'truncate', 'chunked'], default='delete',
+                        help="delete: one DELETE transaction (default); "
+                             "truncate: TRUNCATE ... RESTART IDENTITY CASCADE for disposable "
+                             "environments; chunked: keyed batches in short transactions "
+                             "for shared environments")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"rows per transaction in chunked mode (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument('--pause', type=float, default=DEFAULT_PAUSE,
+                        help=f"seconds to sleep between chunked batches (default: {DEFAULT_PAUSE})")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    instrumentation.recorder.configure(args.cprofile_dir)
+    
     print("Beta BSS Database Cleanup Utility")
     print("=" * 40)
     
-    # Verify database structure first
-    if not verify_database_structure():
-        print("Database structure verification failed. Exiting.")
-        sys.exit(1)
-    
-    # Check for /delete_all parameter
-    if len(sys.argv) > 1 and sys.argv[1] == "/delete_all":
-        print("Non-interactive mode: Proceeding with deletion...")
-        cleanup_database()
-        
-        print("\nCleanup completed successfully!")
-        print("The database has been cleared of all user data and messages.")
-        print("You can now register new users and post new messages.")
-        
-    else:
-        print("WARNING: This will permanently delete ALL data!")
-        print("- All user accounts and profiles")
-        print("- All messages and posts")
-        print("- All user sessions")
-        print("- All activity statistics")
-        print("=" * 40)
-        
-        confirm = input("Are you sure you want to proceed? Type 'DELETE ALL' to confirm: ")
-        
-        if confirm == "DELETE ALL":
+    try:
+        # Ask before connecting, so no transaction sits idle while the
+        # prompt waits
+        if args.confirm == "/delete_all":
+            print("Non-interactive mode: Proceeding with deletion...")
+        else:
+            print("WARNING: This will permanently delete ALL data!")
+            print("- All user accounts and profiles")
+            print("- All messages and posts")
+            print("- All user sessions")
+            print("- All activity statistics")
+            print("=" * 40)
+            
+            confirm = input("Are you sure you want to proceed? Type 'DELETE ALL' to confirm: ")
+            
+            if confirm != "DELETE ALL":
+                print("Cleanup cancelled. No data was deleted.")
+                return
             print("\nStarting cleanup process...")
-            cleanup_database()
+        
+        with phase('connect'):
+            get_pool()
+        with DatabaseSession(single_transaction=args.mode != 'chunked') as session:
+            # Verify database structure first
+            with phase('verify structure'):
+                verified = verify_database_structure(session)
+            if not verified:
+                print("Database structure verification failed. Exiting.")
+                sys.exit(1)
+            
+            run_cleanup(session, args.mode, args.batch_size, args.pause)
             
             print("\nCleanup completed successfully!")
             print("The database has been cleared of all user data and messages.")
             print("You can now register new users and post new messages.")
             
-        else:
-            print("Cleanup cancelled. No data was deleted.")
+            with phase('commit'):
+                session.conn.commit()
+    finally:
+        close_pool()
+        # Failed runs still report the phases that completed
+        if args.metrics:
+            instrumentation.recorder.write_report(args.metrics)
 
 if __name__ == "__main__":
     cleanup_all()
\ No newline at end of file
@@ -3,6 +3,7 @@ import { useMutation, useQueryClient } from "@tanstack/react-query";
 import { apiRequest } from "@/lib/queryClient";
 import { useToast } from "@/hooks/use-toast";
 import { isUnauthorizedError } from "@/lib/authUtils";
+import { removeMessageFromFeed } from "@/lib/feedCache";
 
 interface DeleteConfirmModalProps {
   messageId?: number;
@@ -24,12 +25,12 @@ export default function DeleteConfirmModal({
     mutationFn: async (id: number) => {
       await apiRequest("DELETE", `/api/messages/${id}`);
     },
-    onSuccess: () => {
+    onSuccess: (_, id) => {
       toast({
         title: "Success",
         description: "Message deleted successfully!",
       });
-      queryClient.invalidateQueries({ queryKey: ["/api/messages"] });
+      removeMessageFromFeed(queryClient, id);
       onClose?.();
     },
     onError: (error) => {
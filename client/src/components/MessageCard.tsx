@@ -4,6 +4,7 @@ import { getBadgeInfo } from "@/lib/badges";
 import { useMutation, useQueryClient } from "@tanstack/react-query";
 import { useToast } from "@/hooks/use-toast";
 import { apiRequest } from "@/lib/queryClient";
+import { removeMessageFromFeed } from "@/lib/feedCache";
 import type { MessageWithUser, User } from "@shared/schema";
 
 interface MessageCardProps {
@@ -24,12 +25,12 @@ export default function MessageCard({ message, currentUser }: MessageCardProps)
     mutationFn: async (messageId: number) => {
       await apiRequest("DELETE", `/api/messages/${messageId}`);
     },
-    onSuccess: () => {
+    onSuccess: (_, messageId) => {
       toast({
         title: "Success",
         description: "Message deleted successfully!",
       });
-      queryClient.invalidateQueries({ queryKey: ["/api/messages"] });
+      removeMessageFromFeed(queryClient, messageId);
       setShowDeleteModal(false);
     },
     onError: (error: any) => {
@@ -3,6 +3,7 @@ import { useMutation, useQueryClient } from "@tanstack/react-query";
 import { apiRequest } from "@/lib/queryClient";
 import { useToast } from "@/hooks/use-toast";
 import { isUnauthorizedError } from "@/lib/authUtils";
+import { isFeedStreamConnected } from "@/hooks/useFeedEvents";
 
 export default function NewMessageForm() {
   const [content, setContent] = useState("");
@@ -22,7 +23,10 @@ export default function NewMessageForm() {
       });
       setContent("");
       setCharCount(0);
-      queryClient.invalidateQueries({ queryKey: ["/api/messages"] });
+      // The new message arrives as a pushed event; refetch only without the stream
+      if (!isFeedStreamConnected()) {
+        queryClient.invalidateQueries({ queryKey: ["/api/messages"] });
+      }
     },
     onError: (error) => {
       if (isUnauthorizedError(error as Error)) {
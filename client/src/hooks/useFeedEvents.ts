@@ -0,0 +1,42 @@
+import { useEffect } from "react";
+import { useQueryClient } from "@tanstack/react-query";
+import type { FeedEvent } from "@shared/schema";
+import { applyFeedEvent, FEED_QUERY_KEY } from "@/lib/feedCache";
+
+let connected = false;
+
+// Whether pushed events are arriving; mutations refetch when they are not
+export function isFeedStreamConnected() {
+  return connected;
+}
+
+export function useFeedEvents(enabled: boolean) {
+  const queryClient = useQueryClient();
+
+  useEffect(() => {
+    if (!enabled) return;
+
+    const source = new EventSource("/api/messages/stream", { withCredentials: true });
+    let openedBefore = false;
+
+    source.onopen = () => {
+      // Events sent while the stream was reconnecting were missed
+      if (openedBefore) {
+        queryClient.invalidateQueries({ queryKey: FEED_QUERY_KEY });
+      }
+      openedBefore = true;
+      connected = true;
+    };
+    source.onerror = () => {
+      connected = false;
+    };
+    source.onmessage = (event) => {
+      applyFeedEvent(queryClient, JSON.parse(event.data) as FeedEvent);
+    };
+
+    return () => {
+      source.close();
+      connected = false;
+    };
+  }, [enabled, queryClient]);
+}
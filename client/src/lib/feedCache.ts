@@ -0,0 +1,59 @@
+import type { QueryClient } from "@tanstack/react-query";
+import type { FeedEvent, MessageWithUser } from "@shared/schema";
+
+export const FEED_QUERY_KEY = ["/api/messages"];
+
+// Matches the server's default page size
+const PAGE_SIZE = 20;
+
+type FeedPage = {
+  messages: MessageWithUser[];
+  totalCount: number;
+};
+
+// Applies a pushed event to the cached first page instead of refetching it
+export function applyFeedEvent(queryClient: QueryClient, event: FeedEvent) {
+  if (event.type === "resync") {
+    queryClient.invalidateQueries({ queryKey: FEED_QUERY_KEY });
+    return;
+  }
+
+  queryClient.setQueryData<FeedPage>(FEED_QUERY_KEY, (page) => {
+    if (!page) return page;
+
+    if (event.type === "message.deleted") {
+      return {
+        messages: page.messages.filter((message) => message.id !== event.id),
+        totalCount: event.totalCount,
+      };
+    }
+
+    if (page.messages.some((message) => message.id === event.message.id)) {
+      return { ...page, totalCount: event.totalCount };
+    }
+    // The author's post count changed, so refresh it on their other messages
+    const messages = [
+      event.message,
+      ...page.messages.map((message) =>
+        message.userId === event.message.userId
+          ? { ...message, user: event.message.user }
+          : message,
+      ),
+    ];
+    return {
+      messages: messages.slice(0, Math.max(page.messages.length, PAGE_SIZE)),
+      totalCount: event.totalCount,
+    };
+  });
+}
+
+// Drops a message the current user just deleted without waiting for the push
+export function removeMessageFromFeed(queryClient: QueryClient, id: number) {
+  queryClient.setQueryData<FeedPage>(FEED_QUERY_KEY, (page) => {
+    if (!page || !page.messages.some((message) => message.id === id)) return page;
+    return {
+      messages: page.messages.filter((message) => message.id !== id),
+      totalCount: page.totalCount - 1,
+    };
+  });
+}
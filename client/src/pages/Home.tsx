@@ -1,5 +1,6 @@
 import { useEffect } from "react";
 import { useAuth } from "@/hooks/useAuth";
+import { useFeedEvents } from "@/hooks/useFeedEvents";
 import { useToast } from "@/hooks/use-toast";
 import Navigation from "@/components/Navigation";
 import NewMessageForm from "@/components/NewMessageForm";
@@ -29,6 +30,9 @@ export default function Home() {
     }
   }, [isAuthenticated, isLoading, toast]);
 
+  // Keep the cached page current from pushed events
+  useFeedEvents(isAuthenticated);
+
   const { data: messagesData, isLoading: messagesLoading, error } = useQuery<{
     messages: MessageWithUser[];
     totalCount: number;
@@ -0,0 +1,187 @@
+"""
+Shared database access for the seed and cleanup scripts.
+
+Connections come from one process-wide pool, so a script run pays the TCP
+and authentication handshake once instead of once per phase. A
+DatabaseSession keeps a single pooled connection for the whole run and
+either wraps every phase in one transaction or commits at checkpoints.
+"""
+
+import os
+import sys
+import threading
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool
+from psycopg2.extensions import (STATUS_READY, connection as _connection, cursor as _cursor,
+                                  make_dsn, parse_dsn)
+from psycopg2.extras import execute_values
+
+# Rows per multi-row statement sent by execute_values
+DEFAULT_PAGE_SIZE = 1000
+
+_pool = None
+
+_round_trips = 0
+_round_trips_lock = threading.Lock()
+
+
+def get_database_url():
+    """Get database URL from environment variables."""
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        print("Error: DATABASE_URL environment variable not found")
+        print("Make sure you're running this in the same environment as your app")
+        sys.exit(1)
+    return database_url
+
+
+def get_database_name():
+    """Return the database name that DATABASE_URL points at."""
+    return parse_dsn(get_database_url())['dbname']
+
+
+def round_trips():
+    """Number of statements sent to the server through pooled connections."""
+    return _round_trips
+
+
+def _count_round_trip():
+    global _round_trips
+    with _round_trips_lock:
+        _round_trips += 1
+
+
+class CountingCursor(_cursor):
+    """Cursor that counts every statement it sends, for instrumentation.
+
+    Each execute_values page and each COPY counts once; fetches from
+    server-side cursors are not counted.
+    """
+
+    def execute(self, query, vars=None):
+        _count_round_trip()
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        for vars in vars_list:
+            self.execute(query, vars)
+
+    def copy_expert(self, sql, file, size=8192):
+        _count_round_trip()
+        return super().copy_expert(sql, file, size)
+
+
+class CountingConnection(_connection):
+    """Connection whose cursors, commits and rollbacks count as round trips.
+
+    Commit and rollback only reach the server inside a transaction.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cursor_factory = CountingCursor
+
+    def commit(self):
+        if self.status != STATUS_READY:
+            _count_round_trip()
+        return super().commit()
+
+    def rollback(self):
+        if self.status != STATUS_READY:
+            _count_round_trip()
+        return super().rollback()
+
+
+def maintenance_connection(dbname='postgres'):
+    """Open an autocommit connection to another database on the same server.
+
+    Used for statements that cannot run inside a transaction or while
+    connected to the target database, such as CREATE/DROP DATABASE.
+    """
+    conn = psycopg2.connect(make_dsn(get_database_url(), dbname=dbname))
+    conn.autocommit = True
+    return conn
+
+
+def get_pool(maxconn=4):
+    """Return the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        _pool = pool.ThreadedConnectionPool(1, maxconn, get_database_url(),
+                                            connection_factory=CountingConnection)
+    return _pool
+
+
+def close_pool():
+    """Close every pooled connection."""
+    global _pool
+    if _pool is not None:
+        _pool.closeall()
+        _pool = None
+
+
+@contextmanager
+def connection():
+    """Borrow a connection from the pool for the duration of a block.
+
+    Commits on success and rolls back on error before returning the
+    connection to the pool.
+    """
+    conn = get_pool().getconn()
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        get_pool().putconn(conn)
+
+
+class DatabaseSession:
+    """A pooled connection shared by every phase of a script run.
+
+    With single_transaction=True (the default) nothing is committed until
+    the session exits cleanly, so a failed run leaves the database
+    untouched. With single_transaction=False each checkpoint() commits the
+    work done so far, keeping transactions short on very large loads.
+    """
+
+    def __init__(self, single_transaction=True):
+        self.single_transaction = single_transaction
+        self.conn = None
+        self.cur = None
+
+    def __enter__(self):
+        self.conn = get_pool().getconn()
+        self.cur = self.conn.cursor()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+        finally:
+            self.cur.close()
+            get_pool().putconn(self.conn)
+            self.cur = None
+            self.conn = None
+        return False
+
+    def checkpoint(self):
+        """Commit pending work unless the run is a single transaction."""
+        if not self.single_transaction:
+            self.conn.commit()
+
+    def execute_values(self, query, rows, template=None, page_size=DEFAULT_PAGE_SIZE, fetch=False):
+        """Send rows as multi-row statements of up to page_size rows each.
+
+        query must contain a single %s placeholder for the VALUES list.
+        Returns the fetched rows when fetch=True.
+        """
+        return execute_values(self.cur, query, rows, template=template,
+                              page_size=page_size, fetch=fetch)
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Binary dataset snapshots for moving a seeded database between machines.
+
+`export` streams each table with COPY ... TO STDOUT (FORMAT binary) into
+gzip-compressed chunk files plus a manifest.json with row counts, column
+lists and per-chunk checksums. `import` drops the secondary indexes and
+foreign keys, loads every table in parallel from the chunks, then rebuilds
+the indexes and constraints. If a load fails, the dropped indexes and
+foreign keys (as NOT VALID) are put back best-effort and the load error is
+reported. Data only ever passes through a small buffer, so memory stays
+flat whatever the table size.
+
+Usage:
+    python db_snapshot.py export DIR [--include-session]
+    python db_snapshot.py import DIR [--jobs N]
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import hashlib
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import psycopg2
+from psycopg2 import sql
+from db_session import DatabaseSession, connection, get_pool, close_pool
+
+# Snapshot format version written to the manifest
+SNAPSHOT_VERSION = 1
+
+# Uncompressed bytes per chunk file
+DEFAULT_CHUNK_BYTES = 256 * 1024 * 1024
+
+# Bytes moved per read/write between psycopg2 and the chunk files
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# Tables in load order; session is only included on request
+TABLES = ['users', 'messages']
+OPTIONAL_TABLES = ['session']
+
+class ChunkWriter:
+    """File-like sink that rolls COPY output over into gzip chunk files."""
+
+    def __init__(self, directory, table, chunk_bytes, compresslevel=6):
+        self.directory = directory
+        self.table = table
+        self.chunk_bytes = chunk_bytes
+        self.compresslevel = compresslevel
+        self.chunks = []
+        self.file = None
+        self.digest = None
+        self.size = 0
+
+    def _open_next(self):
+        self.close()
+        name = f"{self.table}.{len(self.chunks):04d}.bin.gz"
+        self.file = gzip.open(os.path.join(self.directory, name), 'wb',
+                              compresslevel=self.compresslevel)
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.chunks.append({'file': name})
+
+    def write(self, data):
+        view = memoryview(data)
+        while view:
+            if self.file is None or self.size >= self.chunk_bytes:
+                self._open_next()
+            part = view[:self.chunk_bytes - self.size]
+            self.file.write(part)
+            self.digest.update(part)
+            self.size += len(part)
+            view = view[len(part):]
+        return len(data)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.chunks[-1].update(bytes=self.size, sha256=self.digest.hexdigest())
+            self.file = None
+
+class ChunkReader:
+    """File-like source that replays chunk files as one COPY stream.
+
+    Every chunk is checksummed while it is read; a mismatch raises before
+    the COPY completes, so the load transaction rolls back.
+    """
+
+    def __init__(self, directory, chunks):
+        self.directory = directory
+        self.pending = list(chunks)
+        self.chunk = None
+        self.file = None
+        self.digest = None
+
+    def _open_next(self):
+        self._finish()
+        if not self.pending:
+            return False
+        self.chunk = self.pending.pop(0)
+        self.file = gzip.open(os.path.join(self.directory, self.chunk['file']), 'rb')
+        self.digest = hashlib.sha256()
+        return True
+
+    def _finish(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            if self.digest.hexdigest() != self.chunk['sha256']:
+                raise ValueError(f"Checksum mismatch in {self.chunk['file']}")
+
+    def read(self, size=COPY_BUFFER_SIZE):
+        while True:
+            if self.file is None and not self._open_next():
+                return b''
+            data = self.file.read(size)
+            if data:
+                self.digest.update(data)
+                return data
+            self._finish()
+
+def copyable_columns(cur, table):
+    """Columns COPY can write, in table order (generated columns excluded)."""
+    cur.execute("""
+        SELECT column_name
+        FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = %s AND is_generated = 'NEVER'
+        ORDER BY ordinal_position
+    """, (table,))
+    return [row[0] for row in cur.fetchall()]
+
+def copy_statement(table, columns, direction, options='FORMAT binary'):
+    """Build a COPY TO STDOUT / FROM STDIN statement."""
+    return sql.SQL("COPY {} ({}) {} ({})").format(
+        sql.Identifier(table),
+        sql.SQL(', ').join(sql.Identifier(column) for column in columns),
+        sql.SQL(direction),
+        sql.SQL(options)
+    )
+
+def export_snapshot(directory, tables, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """Export tables from one consistent snapshot into directory."""
+    os.makedirs(directory, exist_ok=True)
+    manifest = {
+        'version': SNAPSHOT_VERSION,
+        'created_at': datetime.utcnow().isoformat() + 'Z',
+        'tables': {},
+    }
+
+    with DatabaseSession() as session:
+        cur = session.cur
+        cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        manifest['server_version'] = session.conn.server_version
+
+        for table in tables:
+            started = time.perf_counter()
+            columns = copyable_columns(cur, table)
+            writer = ChunkWriter(directory, table, chunk_bytes)
+            try:
+                cur.copy_expert(copy_statement(table, columns, 'TO STDOUT').as_string(cur),
+                                writer, size=COPY_BUFFER_SIZE)
+            finally:
+                writer.close()
+
+            manifest['tables'][table] = {
+                'columns': columns,
+                'rows': cur.rowcount,
+                'chunks': writer.chunks,
+            }
+            elapsed = time.perf_counter() - started
+            raw_bytes = sum(chunk['bytes'] for chunk in writer.chunks)
+            print(f"Exported {table}: {cur.rowcount:,} rows, {raw_bytes / 1e6:,.1f} MB "
+                  f"in {len(writer.chunks)} chunks ({elapsed:.1f}s)")
+
+    with open(os.path.join(directory, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Snapshot written to {directory}")
+
+def capture_schema_objects(cur, tables):
+    """Return (foreign keys, secondary indexes) on tables as (name, table, definition)."""
+    cur.execute("""
+        SELECT c.conname, t.relname, pg_get_constraintdef(c.oid)
+        FROM pg_constraint c
+        JOIN pg_class t ON t.oid = c.conrelid
+        WHERE c.contype = 'f'
+        AND t.relnamespace = 'public'::regnamespace
+        AND t.relname = ANY(%s)
+    """, (tables,))
+    foreign_keys = cur.fetchall()
+
+    cur.execute("""
+        SELECT ic.relname, t.relname, pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        JOIN pg_class ic ON ic.oid = i.indexrelid
+        JOIN pg_class t ON t.oid = i.indrelid
+        WHERE t.relnamespace = 'public'::regnamespace
+        AND t.relname = ANY(%s)
+        AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+    """, (tables,))
+    indexes = cur.fetchall()
+    return foreign_keys, indexes
+
+def load_table(directory, table, info):
+    """Truncate and reload one table on its own pooled connection."""
+    started = time.perf_counter()
+    with connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("TRUNCATE {}").format(sql.Identifier(table)))
+            # FREEZE is allowed because the table was truncated in this
+            # transaction; rows are written pre-frozen, saving a later
+            # rewrite by VACUUM
+            statement = copy_statement(table, info['columns'], 'FROM STDIN',
+                                       'FORMAT binary, FREEZE')
+            cur.copy_expert(statement.as_string(cur),
+                            ChunkReader(directory, info['chunks']), size=COPY_BUFFER_SIZE)
+            loaded = cur.rowcount
+    if loaded != info['rows']:
+        raise ValueError(f"{table}: loaded {loaded} rows, manifest says {info['rows']}")
+    print(f"Loaded {table}: {loaded:,} rows in {time.perf_counter() - started:.1f}s")
+
+def run_statement(statement):
+    """Run one DDL statement on its own pooled connection."""
+    started = time.perf_counter()
+    with connection() as conn:
+        with conn.cursor() as cur:
+            if isinstance(statement, sql.Composable):
+                statement = statement.as_string(cur)
+            cur.execute(statement)
+    print(f"  {statement[:70]}... ({time.perf_counter() - started:.1f}s)")
+
+def add_foreign_key(name, table, definition, validate=True):
+    """Return the ALTER TABLE that re-adds a captured foreign key."""
+    statement = sql.SQL("ALTER TABLE {} ADD CONSTRAINT {} {}").format(
+        sql.Identifier(table), sql.Identifier(name), sql.SQL(definition))
+    if not validate:
+        statement += sql.SQL(" NOT VALID")
+    return statement
+
+def restore_schema_objects(foreign_keys, indexes):
+    """Best-effort restore of dropped DDL after a failed load; never raises.
+
+    Foreign keys come back NOT VALID: new writes are checked, but rows from
+    a partial load are not, so a mismatch cannot stop the rest of the
+    schema from being restored. Run VALIDATE CONSTRAINT once the data has
+    been fixed.
+    """
+    print("Import failed; restoring indexes and constraints...")
+    statements = [definition for _, _, definition in indexes]
+    statements += [add_foreign_key(name, table, definition, validate=False)
+                   for name, table, definition in foreign_keys]
+    for statement in statements:
+        try:
+            run_statement(statement)
+        except psycopg2.Error as e:
+            print(f"  Could not restore: {e}".rstrip())
+
+def import_snapshot(directory, jobs=None):
+    """Load a snapshot, replacing the contents of its tables."""
+    with open(os.path.join(directory, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != SNAPSHOT_VERSION:
+        print(f"Error: unsupported snapshot version {manifest.get('version')}")
+        sys.exit(1)
+
+    tables = list(manifest['tables'])
+    jobs = jobs or len(tables)
+    get_pool(maxconn=jobs + 1)
+    started = time.perf_counter()
+
+    with DatabaseSession() as session:
+        foreign_keys, indexes = capture_schema_objects(session.cur, tables)
+        for name, table, _ in foreign_keys:
+            session.cur.execute(sql.SQL("ALTER TABLE {} DROP CONSTRAINT {}").format(
+                sql.Identifier(table), sql.Identifier(name)))
+        for name, _, _ in indexes:
+            session.cur.execute(sql.SQL("DROP INDEX {}").format(sql.Identifier(name)))
+    print(f"Dropped {len(foreign_keys)} foreign keys and {len(indexes)} indexes")
+
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(load_table, directory, table, manifest['tables'][table])
+                       for table in tables]
+            for future in futures:
+                future.result()
+    except BaseException:
+        # Other tables may already be committed, so the foreign keys cannot be
+        # validated; put the DDL back without letting it hide the load error
+        restore_schema_objects(foreign_keys, indexes)
+        raise
+
+    print("Rebuilding indexes and constraints...")
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        list(executor.map(run_statement, [definition for _, _, definition in indexes]))
+    for name, table, definition in foreign_keys:
+        run_statement(add_foreign_key(name, table, definition))
+
+    with DatabaseSession() as session:
+        if 'messages' in tables:
+            session.cur.execute("""
+                SELECT setval(pg_get_serial_sequence('messages', 'id'),
+                              COALESCE(MAX(id), 0) + 1, false)
+                FROM messages
+            """)
+        for table in tables:
+            session.cur.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(table)))
+
+    print(f"Snapshot imported in {time.perf_counter() - started:.1f}s")
+
+def main():
+    """Parse command-line options and run the requested command."""
+    parser = argparse.ArgumentParser(description="Export and import binary dataset snapshots.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export = commands.add_parser('export', help="write a snapshot of the database")
+    export.add_argument('directory')
+    export.add_argument('--include-session', action='store_true',
+                        help="also snapshot the express-session table")
+    export.add_argument('--chunk-mb', type=int, default=DEFAULT_CHUNK_BYTES // (1024 * 1024),
+                        help="uncompressed megabytes per chunk file (default: 256)")
+
+    load = commands.add_parser('import', help="replace table contents from a snapshot")
+    load.add_argument('directory')
+    load.add_argument('--jobs', type=int,
+                      help="tables loaded in parallel (default: one per table)")
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'export':
+            tables = TABLES + (OPTIONAL_TABLES if args.include_session else [])
+            export_snapshot(args.directory, tables, args.chunk_mb * 1024 * 1024)
+        else:
+            import_snapshot(args.directory, args.jobs)
+    except (psycopg2.Error, ValueError, OSError) as e:
+        print(f"Snapshot error: {e}")
+        sys.exit(1)
+    finally:
+        close_pool()
+
+if __name__ == "__main__":
+    main()
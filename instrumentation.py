@@ -0,0 +1,135 @@
+"""
+Phase-level timing and profiling for the seed and cleanup scripts.
+
+Scripts wrap each unit of work in phase(name) and report how many rows it
+processed. For every phase the recorder captures wall time, CPU time of
+this process and of finished child processes (the bcrypt pool), rows and
+rows/sec, and the number of statements sent through db_session's pool.
+write_report() emits the result as JSON for CI to compare across runs.
+
+With a profile directory configured, each top-level phase also runs under
+cProfile and its stats are written to <dir>/<tool>.<phase>.prof, ready for
+pstats or snakeviz.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import cProfile
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from db_session import round_trips
+
+
+class Phase:
+    """Measurements of one phase; set rows while the phase runs."""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.child_cpu_seconds = 0.0
+        self.round_trips = 0
+        self.profile_path = None
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'wall_seconds': round(self.wall_seconds, 6),
+            'cpu_seconds': round(self.cpu_seconds, 6),
+            'child_cpu_seconds': round(self.child_cpu_seconds, 6),
+            'rows': self.rows,
+            'rows_per_sec': round(self.rows / self.wall_seconds, 1) if self.wall_seconds else None,
+            'round_trips': self.round_trips,
+            'profile': self.profile_path,
+        }
+
+
+class Recorder:
+    """Collects phases for one script run."""
+
+    def __init__(self):
+        self.tool = os.path.splitext(os.path.basename(sys.argv[0]))[0] or 'python'
+        self.started_at = datetime.now(timezone.utc)
+        self.started = time.perf_counter()
+        self.phases = []
+        self.profile_dir = None
+        self._depth = 0
+
+    def configure(self, profile_dir=None):
+        """Enable per-phase cProfile output into profile_dir."""
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+        self.profile_dir = profile_dir
+
+    @contextmanager
+    def phase(self, name):
+        record = Phase(name)
+        # Only top-level phases are profiled; cProfile cannot nest
+        profiler = cProfile.Profile() if self.profile_dir and self._depth == 0 else None
+        self._depth += 1
+        times = os.times()
+        started_cpu = time.process_time()
+        started_round_trips = round_trips()
+        started = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler:
+                profiler.disable()
+            finished = os.times()
+            record.wall_seconds = time.perf_counter() - started
+            record.cpu_seconds = time.process_time() - started_cpu
+            record.child_cpu_seconds = ((finished.children_user - times.children_user)
+                                        + (finished.children_system - times.children_system))
+            record.round_trips = round_trips() - started_round_trips
+            self._depth -= 1
+            if profiler:
+                slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', name).strip('_')
+                record.profile_path = os.path.join(self.profile_dir, f"{self.tool}.{slug}.prof")
+                profiler.dump_stats(record.profile_path)
+            self.phases.append(record)
+
+    def report(self):
+        phases = [record.to_dict() for record in self.phases]
+        return {
+            'tool': self.tool,
+            'argv': sys.argv[1:],
+            'started_at': self.started_at.isoformat(),
+            'wall_seconds': round(time.perf_counter() - self.started, 6),
+            'round_trips': round_trips(),
+            'phases': phases,
+        }
+
+    def write_report(self, path):
+        """Write the JSON report to path, or to stdout for '-'."""
+        report = json.dumps(self.report(), indent=2)
+        if path == '-':
+            print(report)
+            return
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(report + '\n')
+        print(f"Metrics written to {path}")
+
+
+recorder = Recorder()
+
+
+def phase(name):
+    """Measure a block as a named phase of the current run."""
+    return recorder.phase(name)
+
+
+def add_arguments(parser):
+    """Add the shared --metrics and --cprofile-dir options to a parser."""
+    parser.add_argument('--metrics', metavar='PATH',
+                        help="write per-phase timings, rows and round trips as JSON "
+                             "to PATH ('-' for stdout)")
+    parser.add_argument('--cprofile-dir', metavar='DIR',
+                        help="profile each phase with cProfile and write the stats to DIR")
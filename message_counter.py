@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Maintained message counter for the feed's totalCount.
+
+GET /api/messages reads the row count from the counters table instead of
+running SELECT count(*) over messages on every request. The counter is
+kept current by statement-level triggers using transition tables, so it
+stays exact for every writer: the server, COPY-based seeding, retention
+and TRUNCATE-based cleanup alike.
+
+The count is split over COUNTER_SHARDS rows. Each backend adds its deltas
+to the slot chosen by its pid, so concurrent writers update different
+rows instead of queueing on one row lock until each other's commit;
+readers sum the slots.
+
+Commands:
+    install   create the counters table and triggers, then backfill
+    backfill  recount messages and reset the counter
+    verify    compare the counter with count(*); exits 1 on drift
+
+Usage:
+    python message_counter.py install
+    python message_counter.py verify [--fix]
+"""
+
+import sys
+import argparse
+import psycopg2
+from db_session import DatabaseSession, close_pool
+
+# Counter rows maintained for the messages table (its TG_TABLE_NAME)
+COUNTER_NAME = 'messages'
+
+# Rows the counter is spread over; more shards, fewer writers per row lock
+COUNTER_SHARDS = 16
+
+CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS counters (
+        name varchar(64) NOT NULL,
+        slot smallint NOT NULL DEFAULT 0,
+        value bigint NOT NULL DEFAULT 0,
+        PRIMARY KEY (name, slot)
+    )
+"""
+
+# Tables created before sharding have a single row per name keyed on name
+# alone; that row becomes slot 0
+UPGRADE_TABLE = """
+    ALTER TABLE counters ADD COLUMN IF NOT EXISTS slot smallint NOT NULL DEFAULT 0;
+    ALTER TABLE counters
+        DROP CONSTRAINT IF EXISTS counters_pkey,
+        ADD CONSTRAINT counters_pkey PRIMARY KEY (name, slot)
+"""
+
+# One function serves all three triggers; transition tables are only
+# visible to the trigger that declared them, so each branch reads its own
+CREATE_FUNCTION = f"""
+    CREATE OR REPLACE FUNCTION maintain_row_counter() RETURNS trigger AS $$
+    DECLARE
+        delta bigint;
+    BEGIN
+        IF TG_OP = 'TRUNCATE' THEN
+            UPDATE counters SET value = 0 WHERE name = TG_TABLE_NAME;
+            RETURN NULL;
+        ELSIF TG_OP = 'INSERT' THEN
+            SELECT count(*) INTO delta FROM new_rows;
+        ELSE
+            SELECT -count(*) INTO delta FROM old_rows;
+        END IF;
+
+        IF delta <> 0 THEN
+            INSERT INTO counters (name, slot, value)
+            VALUES (TG_TABLE_NAME, pg_backend_pid() % {COUNTER_SHARDS}, delta)
+            ON CONFLICT (name, slot) DO UPDATE SET value = counters.value + EXCLUDED.value;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+"""
+
+TRIGGERS = {
+    'messages_count_insert': """
+        CREATE TRIGGER messages_count_insert
+        AFTER INSERT ON messages
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION maintain_row_counter()
+    """,
+    'messages_count_delete': """
+        CREATE TRIGGER messages_count_delete
+        AFTER DELETE ON messages
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION maintain_row_counter()
+    """,
+    'messages_count_truncate': """
+        CREATE TRIGGER messages_count_truncate
+        AFTER TRUNCATE ON messages
+        FOR EACH STATEMENT EXECUTE FUNCTION maintain_row_counter()
+    """,
+}
+
+def lock_messages(cur):
+    """Block writers so the recount and the triggers see the same rows."""
+    cur.execute("LOCK TABLE messages IN SHARE MODE")
+
+def backfill(session):
+    """Recount messages and store the result in slot 0, clearing the other slots."""
+    cur = session.cur
+    lock_messages(cur)
+    cur.execute("SELECT count(*) FROM messages")
+    total = cur.fetchone()[0]
+    cur.execute("DELETE FROM counters WHERE name = %s", (COUNTER_NAME,))
+    cur.execute("INSERT INTO counters (name, slot, value) VALUES (%s, 0, %s)",
+                (COUNTER_NAME, total))
+    print(f"Counter '{COUNTER_NAME}' set to {total:,}")
+    return total
+
+def install(session):
+    """Create the counters table and triggers, then backfill."""
+    cur = session.cur
+    cur.execute(CREATE_TABLE)
+    cur.execute(UPGRADE_TABLE)
+    cur.execute(CREATE_FUNCTION)
+    # Taken before the triggers change so no write slips between them and the recount
+    lock_messages(cur)
+    for name, statement in TRIGGERS.items():
+        cur.execute(f"DROP TRIGGER IF EXISTS {name} ON messages")
+        cur.execute(statement)
+    print(f"Installed {len(TRIGGERS)} triggers on messages")
+    backfill(session)
+
+def verify(session):
+    """Compare the counter with count(*) in one snapshot; returns True if they agree."""
+    cur = session.cur
+    cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+    cur.execute("SELECT to_regclass('counters') IS NOT NULL")
+    row = None
+    if cur.fetchone()[0]:
+        cur.execute("""
+            SELECT sum(value)::bigint FROM counters WHERE name = %s HAVING count(*) > 0
+        """, (COUNTER_NAME,))
+        row = cur.fetchone()
+    cur.execute("SELECT count(*) FROM messages")
+    actual = cur.fetchone()[0]
+
+    if row is None:
+        print(f"Counter '{COUNTER_NAME}' is missing (actual count {actual:,}); run install")
+        return False
+    if row[0] != actual:
+        print(f"Drift: counter is {row[0]:,} but messages has {actual:,} rows "
+              f"({row[0] - actual:+,})")
+        return False
+    print(f"Counter '{COUNTER_NAME}' matches: {actual:,} messages")
+    return True
+
+def main():
+    """Parse command-line options and run the requested command."""
+    parser = argparse.ArgumentParser(description="Install, backfill and verify the message counter.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('install', help="create the counters table and triggers, then backfill")
+    commands.add_parser('backfill', help="recount messages and reset the counter")
+    verify_parser = commands.add_parser('verify', help="check the counter against count(*)")
+    verify_parser.add_argument('--fix', action='store_true', help="backfill if drift is found")
+    args = parser.parse_args()
+
+    print("Message Counter")
+    print("=" * 40)
+
+    ok = True
+    try:
+        if args.command == 'install':
+            with DatabaseSession() as session:
+                install(session)
+        elif args.command == 'backfill':
+            with DatabaseSession() as session:
+                backfill(session)
+        else:
+            with DatabaseSession() as session:
+                ok = verify(session)
+            if not ok and args.fix:
+                with DatabaseSession() as session:
+                    backfill(session)
+                ok = True
+    except psycopg2.Error as e:
+        print(f"Database error: {e}")
+        sys.exit(1)
+    finally:
+        close_pool()
+
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
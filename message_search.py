@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Full-text search index for messages.
+
+GET /api/messages/search matches messages.search_vector through the GIN
+index IDX_messages_search_vector. The column is kept current by a trigger
+rather than declared GENERATED ALWAYS: adding a generated column rewrites
+the whole table under an exclusive lock, while a plain nullable column is
+added instantly and can be filled in short batches with the board online.
+
+On a large existing table run install before npm run db:push, which would
+otherwise build the index with a plain (write-blocking) CREATE INDEX.
+
+Commands:
+    install   add the column and trigger, backfill, then build the index
+    backfill  fill search_vector for rows that are missing it
+    verify    check the trigger and index and count unindexed rows;
+              exits 1 if anything is missing
+
+Usage:
+    python message_search.py install [--batch-size 5000] [--pause 0.1]
+    python message_search.py backfill [--batch-size 5000] [--pause 0.1]
+    python message_search.py verify [--fix]
+"""
+
+import sys
+import time
+import argparse
+import psycopg2
+from psycopg2 import sql
+from db_session import DatabaseSession, close_pool, get_database_name, maintenance_connection
+
+# Must match the configuration searchMessages passes to websearch_to_tsquery
+TEXT_SEARCH_CONFIG = 'pg_catalog.english'
+
+INDEX_NAME = 'IDX_messages_search_vector'
+
+TRIGGER_NAME = 'messages_search_vector'
+
+# Rows updated per transaction while backfilling
+DEFAULT_BATCH_SIZE = 5000
+
+# Seconds to sleep between backfill batches
+DEFAULT_PAUSE = 0.1
+
+# Give up on DDL instead of queueing behind long transactions, which would
+# block every reader and writer queued behind the DDL in turn
+LOCK_TIMEOUT = '5s'
+
+ADD_COLUMN = "ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_vector tsvector"
+
+# Fires only when content changes, so the backfill's own UPDATEs skip it
+CREATE_TRIGGER = f"""
+    CREATE TRIGGER {TRIGGER_NAME}
+    BEFORE INSERT OR UPDATE OF content ON messages
+    FOR EACH ROW EXECUTE FUNCTION
+        tsvector_update_trigger(search_vector, '{TEXT_SEARCH_CONFIG}', content)
+"""
+
+BACKFILL_BATCH = f"""
+    UPDATE messages
+    SET search_vector = to_tsvector('{TEXT_SEARCH_CONFIG}', content)
+    WHERE id IN (
+        SELECT id FROM messages
+        WHERE id > %s AND search_vector IS NULL
+        ORDER BY id
+        LIMIT %s
+    )
+    RETURNING id
+"""
+
+def install_trigger(session):
+    """Add the column and the trigger that maintains it for new writes."""
+    cur = session.cur
+    cur.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+    cur.execute(ADD_COLUMN)
+    cur.execute(f"DROP TRIGGER IF EXISTS {TRIGGER_NAME} ON messages")
+    cur.execute(CREATE_TRIGGER)
+    print("Installed search_vector column and trigger on messages")
+
+def backfill(session, batch_size=DEFAULT_BATCH_SIZE, pause=DEFAULT_PAUSE):
+    """Fill search_vector in keyed batches, one commit per batch.
+
+    Rows written since the trigger was installed already have a vector and
+    are skipped. Keys are walked in ascending order, so each batch starts
+    from an index seek instead of rescanning rows already filled.
+    """
+    cur = session.cur
+    last_id = 0
+    total = 0
+    started = time.perf_counter()
+
+    while True:
+        cur.execute(BACKFILL_BATCH, (last_id, batch_size))
+        ids = [row[0] for row in cur.fetchall()]
+        session.checkpoint()
+
+        if not ids:
+            break
+
+        total += len(ids)
+        last_id = max(ids)
+        elapsed = time.perf_counter() - started
+        print(f"  search_vector: filled {total:,} ({total / max(elapsed, 1e-9):,.0f} rows/sec)")
+
+        if pause:
+            time.sleep(pause)
+
+    print(f"Backfilled {total:,} messages")
+    return total
+
+def build_index():
+    """Build the GIN index without blocking writes, replacing an invalid leftover."""
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    conn = maintenance_connection(get_database_name())
+    try:
+        with conn.cursor() as cur:
+            index = sql.Identifier(INDEX_NAME)
+            cur.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)",
+                        (index.as_string(cur),))
+            row = cur.fetchone()
+            if row and not row[0]:
+                # Left behind by an interrupted CONCURRENTLY build
+                print(f"Dropping invalid index {INDEX_NAME}")
+                cur.execute(sql.SQL("DROP INDEX CONCURRENTLY {}").format(index))
+
+            started = time.perf_counter()
+            cur.execute(sql.SQL(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS {} ON messages USING gin (search_vector)"
+            ).format(index))
+            cur.execute("ANALYZE messages")
+            print(f"Built {INDEX_NAME} in {time.perf_counter() - started:.1f}s")
+    finally:
+        conn.close()
+
+def verify(session):
+    """Check the trigger, the index and the backfill; returns True if all are in place."""
+    cur = session.cur
+    cur.execute("""
+        SELECT EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = 'public' AND table_name = 'messages'
+            AND column_name = 'search_vector'
+        )
+    """)
+    if not cur.fetchone()[0]:
+        print("Column messages.search_vector is missing; run install")
+        return False
+
+    ok = True
+    cur.execute("""
+        SELECT EXISTS (
+            SELECT 1 FROM pg_trigger
+            WHERE tgrelid = 'messages'::regclass AND tgname = %s AND tgenabled <> 'D'
+        )
+    """, (TRIGGER_NAME,))
+    if not cur.fetchone()[0]:
+        print(f"Trigger {TRIGGER_NAME} is missing or disabled; new messages are not indexed")
+        ok = False
+
+    cur.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)",
+                (sql.Identifier(INDEX_NAME).as_string(cur),))
+    row = cur.fetchone()
+    if row is None:
+        print(f"Index {INDEX_NAME} is missing; searches scan the whole table")
+        ok = False
+    elif not row[0]:
+        print(f"Index {INDEX_NAME} is invalid; run install to rebuild it")
+        ok = False
+
+    cur.execute("SELECT count(*) FROM messages WHERE search_vector IS NULL")
+    missing = cur.fetchone()[0]
+    if missing:
+        print(f"{missing:,} messages have no search_vector; run backfill")
+        ok = False
+
+    if ok:
+        print("Search index is complete")
+    return ok
+
+def main():
+    """Parse command-line options and run the requested command."""
+    parser = argparse.ArgumentParser(description="Install, backfill and verify the message search index.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    for name, help_text in (
+        ('install', "add the column and trigger, backfill, then build the index"),
+        ('backfill', "fill search_vector for rows that are missing it"),
+    ):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                             help=f"rows per transaction (default: {DEFAULT_BATCH_SIZE})")
+        command.add_argument('--pause', type=float, default=DEFAULT_PAUSE,
+                             help=f"seconds to sleep between batches (default: {DEFAULT_PAUSE})")
+    verify_parser = commands.add_parser('verify', help="check the trigger, index and backfill")
+    verify_parser.add_argument('--fix', action='store_true',
+                               help="backfill and build the index if anything is missing")
+    args = parser.parse_args()
+
+    print("Message Search Index")
+    print("=" * 40)
+
+    ok = True
+    try:
+        if args.command == 'install':
+            with DatabaseSession() as session:
+                install_trigger(session)
+            with DatabaseSession(single_transaction=False) as session:
+                backfill(session, args.batch_size, args.pause)
+            build_index()
+        elif args.command == 'backfill':
+            with DatabaseSession(single_transaction=False) as session:
+                backfill(session, args.batch_size, args.pause)
+        else:
+            with DatabaseSession() as session:
+                ok = verify(session)
+            if not ok and args.fix:
+                with DatabaseSession() as session:
+                    install_trigger(session)
+                with DatabaseSession(single_transaction=False) as session:
+                    backfill(session)
+                build_index()
+                ok = True
+    except psycopg2.Error as e:
+        print(f"Database error: {e}")
+        sys.exit(1)
+    finally:
+        close_pool()
+
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Migrate avatars/ to content-addressed storage.
+
+The server now stores each processed avatar as <sha256 of the WebP
+bytes>.webp, so identical images share one file. This tool converts files
+written under the old <userId>_<timestamp>.webp scheme: it hashes them in
+parallel, links each one to its content-addressed name, rewrites
+users.avatar_url in batches and then removes the old names. Duplicate
+uploads collapse into a single file.
+
+Usage:
+    python migrate_avatars.py [--dir avatars] [--workers 8] [--batch-size 5000] [--dry-run]
+"""
+
+import os
+import re
+import sys
+import time
+import hashlib
+import argparse
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+import psycopg2
+from db_session import DatabaseSession, close_pool
+from avatar_gc import DEFAULT_AVATAR_DIR, DEFAULT_WORKERS
+
+# URL rewrites per UPDATE statement
+DEFAULT_BATCH_SIZE = 5000
+
+# Names the server writes for content-addressed avatars
+CONTENT_ADDRESSED = re.compile(r'^[0-9a-f]{64}\.webp$')
+
+def legacy_files(avatar_dir):
+    """Return paths of avatar files that are not content-addressed yet.
+
+    The listing is read to the end before any file is linked or unlinked:
+    changing a directory while scandir iterates it may skip entries or
+    return the new content-addressed names.
+    """
+    with os.scandir(avatar_dir) as entries:
+        return [
+            entry.path for entry in entries
+            if (entry.is_file(follow_symlinks=False)
+                and entry.name.endswith('.webp')
+                and not CONTENT_ADDRESSED.match(entry.name))
+        ]
+
+def hash_file(path):
+    """Return (path, size, sha256 hex digest) of a file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return path, os.path.getsize(path), digest.hexdigest()
+
+def link_content_addressed(path, digest):
+    """Make <digest>.webp exist next to path and return its name."""
+    target_name = f"{digest}.webp"
+    target = os.path.join(os.path.dirname(path), target_name)
+    if not os.path.exists(target):
+        try:
+            os.link(path, target)
+        except FileExistsError:
+            pass
+    return target_name
+
+def rewrite_urls(session, mapping):
+    """Point users at the content-addressed names; returns rows updated."""
+    session.execute_values("""
+        UPDATE users AS u
+        SET avatar_url = v.new_url
+        FROM (VALUES %s) AS v(old_url, new_url)
+        WHERE u.avatar_url = v.old_url
+    """, mapping, page_size=len(mapping))
+    return session.cur.rowcount
+
+def migrate(session, avatar_dir, workers=DEFAULT_WORKERS, batch_size=DEFAULT_BATCH_SIZE,
+            dry_run=False):
+    """Hash, link, rewrite and clean up legacy avatar files batch by batch."""
+    stats = {'files': 0, 'unique': 0, 'users': 0, 'reclaimed': 0}
+    seen_digests = set()
+    paths = iter(legacy_files(avatar_dir))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            batch = list(islice(paths, batch_size))
+            if not batch:
+                break
+
+            hashed = list(executor.map(hash_file, batch))
+            stats['files'] += len(hashed)
+            for _, size, digest in hashed:
+                if digest in seen_digests or os.path.exists(
+                        os.path.join(avatar_dir, f"{digest}.webp")):
+                    stats['reclaimed'] += size
+                else:
+                    stats['unique'] += 1
+                seen_digests.add(digest)
+
+            if dry_run:
+                continue
+
+            mapping = [
+                (f"/avatars/{os.path.basename(path)}",
+                 f"/avatars/{link_content_addressed(path, digest)}")
+                for path, _, digest in hashed
+            ]
+            stats['users'] += rewrite_urls(session, mapping)
+            session.checkpoint()
+
+            # Old names are unreferenced once the batch is committed
+            for path, _, _ in hashed:
+                os.unlink(path)
+
+            print(f"  migrated {stats['files']:,} files, {stats['users']:,} users updated")
+
+    return stats
+
+def main():
+    """Parse command-line options and run the migration."""
+    parser = argparse.ArgumentParser(description="Convert avatars to content-addressed storage.")
+    parser.add_argument('--dir', default=DEFAULT_AVATAR_DIR,
+                        help=f"avatar directory (default: {DEFAULT_AVATAR_DIR})")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f"parallel hashing threads (default: {DEFAULT_WORKERS})")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"files migrated per transaction (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="only report how much deduplication would save")
+    args = parser.parse_args()
+
+    print("Avatar Storage Migration")
+    print("=" * 40)
+
+    if not os.path.isdir(args.dir):
+        print(f"Avatar directory {args.dir} not found, nothing to do")
+        return
+
+    started = time.perf_counter()
+    try:
+        with DatabaseSession(single_transaction=False) as session:
+            stats = migrate(session, args.dir, args.workers, args.batch_size, args.dry_run)
+    except psycopg2.Error as e:
+        print(f"Database error: {e}")
+        sys.exit(1)
+    finally:
+        close_pool()
+
+    action = "Would migrate" if args.dry_run else "Migrated"
+    print(f"{action} {stats['files']:,} files into {stats['unique']:,} unique images "
+          f"({stats['reclaimed'] / 1e6:,.1f} MB of duplicates) "
+          f"in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
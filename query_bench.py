@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Query-plan benchmark and index advisor for the storage layer's SQL.
+
+Runs the query shapes that DatabaseStorage issues on every hot path
+(feed page, message count, login lookups, account deletion) with
+EXPLAIN (ANALYZE, BUFFERS) and timed repetitions. With --sizes the
+database is reset and bulk-seeded to each size in turn, so latency growth
+and plan changes (e.g. an index scan turning into a sequential scan) show
+up before they reach production. Missing indexes are recommended and can
+be created with --apply.
+
+WARNING: --sizes replaces all users and messages in the target database.
+
+Usage:
+    python query_bench.py [--repeat 5] [--output results.json] [--apply]
+    python query_bench.py --sizes 10000,100000,1000000 --reset-data
+"""
+
+import sys
+import json
+import time
+import argparse
+import statistics
+import psycopg2
+from psycopg2 import sql
+import seed_generator
+from db_session import DatabaseSession, close_pool, get_database_name, maintenance_connection
+
+# Deep page offset used for the feed query
+DEEP_OFFSET = 10_000
+
+# Sequential scans over more rows than this are reported
+SEQ_SCAN_THRESHOLD = 10_000
+
+USER_COLUMNS = """
+    "users"."id", "users"."username", "users"."email", "users"."password_hash",
+    "users"."password_hint", "users"."first_name", "users"."last_name",
+    "users"."profile_image_url", "users"."date_joined", "users"."is_active",
+    "users"."post_count", "users"."avatar_url", "users"."role",
+    "users"."created_at", "users"."updated_at"
+"""
+
+# Author columns the feed selects (feedAuthorColumns in server/storage.ts)
+FEED_AUTHOR_COLUMNS = """
+    "users"."username", "users"."avatar_url", "users"."profile_image_url",
+    "users"."role", "users"."post_count"
+"""
+
+# The statements DatabaseStorage issues, in the shape Drizzle generates
+QUERIES = {
+    'getMessages': (f"""
+        SELECT "messages"."id", "messages"."content", "messages"."timestamp",
+               "messages"."user_id", {FEED_AUTHOR_COLUMNS}
+        FROM "messages"
+        LEFT JOIN "users" ON "messages"."user_id" = "users"."id"
+        ORDER BY "messages"."timestamp" DESC, "messages"."id" DESC
+        LIMIT %(limit)s OFFSET 0
+    """, False),
+    'getMessages (deep page)': (f"""
+        SELECT "messages"."id", "messages"."content", "messages"."timestamp",
+               "messages"."user_id", {FEED_AUTHOR_COLUMNS}
+        FROM "messages"
+        LEFT JOIN "users" ON "messages"."user_id" = "users"."id"
+        ORDER BY "messages"."timestamp" DESC, "messages"."id" DESC
+        LIMIT %(limit)s OFFSET %(deep_offset)s
+    """, False),
+    'getMessagesPage (deep cursor)': (f"""
+        SELECT "messages"."id", "messages"."content", "messages"."timestamp",
+               "messages"."user_id", {FEED_AUTHOR_COLUMNS}, "messages"."timestamp"::text
+        FROM "messages"
+        LEFT JOIN "users" ON "messages"."user_id" = "users"."id"
+        WHERE ("messages"."timestamp", "messages"."id")
+              < (%(cursor_timestamp)s::timestamp, %(cursor_id)s)
+        ORDER BY "messages"."timestamp" DESC, "messages"."id" DESC
+        LIMIT %(limit)s + 1
+    """, False),
+    'getMessageCount': ("""
+        SELECT sum("counters"."value") FROM "counters"
+        WHERE "counters"."name" = 'messages' HAVING count(*) > 0
+    """, False),
+    'getUserByUsername': (f"""
+        SELECT {USER_COLUMNS} FROM "users" WHERE "users"."username" = %(username)s
+    """, False),
+    'getUserByEmail': (f"""
+        SELECT {USER_COLUMNS} FROM "users" WHERE "users"."email" = %(email)s
+    """, False),
+    # Writes run inside a transaction that is always rolled back
+    'deleteUser (messages)': ("""
+        DELETE FROM "messages" WHERE "messages"."user_id" = %(user_id)s
+    """, True),
+}
+
+# What getMessageCount runs until message_counter.py install has been run
+COUNT_FALLBACK = """
+    SELECT count(*) FROM "messages"
+"""
+
+# Indexes that fix a sequential scan on (query, table)
+INDEX_ADVICE = [
+    {
+        'queries': ['getMessages', 'getMessages (deep page)', 'getMessagesPage (deep cursor)'],
+        'table': 'messages',
+        'columns': ['timestamp', 'id'],
+        'name': 'IDX_messages_timestamp_id',
+    },
+    {
+        'queries': ['deleteUser (messages)'],
+        'table': 'messages',
+        'columns': ['user_id'],
+        'name': 'IDX_messages_user_id',
+    },
+]
+
+def sample_parameters(cur):
+    """Pick realistic parameters: the most active user, a deep cursor and a page size of 20."""
+    cur.execute("""
+        SELECT id, username, email FROM users
+        ORDER BY post_count DESC NULLS LAST
+        LIMIT 1
+    """)
+    row = cur.fetchone() or (None, None, None)
+    # The cursor a client holds after paging DEEP_OFFSET rows into the feed
+    cur.execute("""
+        SELECT timestamp::text, id FROM messages
+        ORDER BY timestamp DESC, id DESC
+        OFFSET %s LIMIT 1
+    """, (DEEP_OFFSET,))
+    cursor = cur.fetchone() or (None, 0)
+    return {
+        'user_id': row[0],
+        'username': row[1],
+        'email': row[2],
+        'limit': 20,
+        'deep_offset': DEEP_OFFSET,
+        'cursor_timestamp': cursor[0],
+        'cursor_id': cursor[1],
+    }
+
+def walk_plan(node, depth=0):
+    """Yield (depth, node) for every node of an EXPLAIN JSON plan."""
+    yield depth, node
+    for child in node.get('Plans', []):
+        yield from walk_plan(child, depth + 1)
+
+def summarize_plan(plan):
+    """Reduce an EXPLAIN (FORMAT JSON) result to the fields worth comparing."""
+    root = plan['Plan']
+    nodes = list(walk_plan(root))
+    return {
+        'shape': ' > '.join(
+            node['Node Type'] + (f" on {node['Relation Name']}" if 'Relation Name' in node else '')
+            + (f" using {node['Index Name']}" if 'Index Name' in node else '')
+            for _, node in nodes
+        ),
+        'execution_ms': plan.get('Execution Time'),
+        'planning_ms': plan.get('Planning Time'),
+        'shared_hit_blocks': root.get('Shared Hit Blocks', 0),
+        'shared_read_blocks': root.get('Shared Read Blocks', 0),
+        'seq_scans': [
+            {'table': node['Relation Name'], 'rows': node.get('Actual Rows', 0)
+             + node.get('Rows Removed by Filter', 0)}
+            for _, node in nodes if node['Node Type'] == 'Seq Scan'
+        ],
+    }
+
+def benchmark_query(session, query, params, is_write, repeat):
+    """Time a query repeat times and capture its EXPLAIN ANALYZE plan."""
+    cur = session.cur
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        cur.execute(query, params)
+        if cur.description:
+            cur.fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+        if is_write:
+            session.conn.rollback()
+
+    cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query, params)
+    plan = cur.fetchone()[0][0]
+    session.conn.rollback()
+
+    result = summarize_plan(plan)
+    result.update({
+        'median_ms': statistics.median(timings),
+        'p95_ms': sorted(timings)[max(int(len(timings) * 0.95) - 1, 0)],
+        'min_ms': min(timings),
+    })
+    return result
+
+def run_benchmarks(session, repeat):
+    """Benchmark every query against the current dataset."""
+    cur = session.cur
+    cur.execute("ANALYZE users")
+    cur.execute("ANALYZE messages")
+    cur.execute("""
+        SELECT (SELECT count(*) FROM users), (SELECT count(*) FROM messages),
+               to_regclass('counters') IS NOT NULL
+    """)
+    users, messages, has_counters = cur.fetchone()
+    params = sample_parameters(cur)
+    session.conn.commit()
+
+    results = {'users': users, 'messages': messages, 'queries': {}}
+    for name, (query, is_write) in QUERIES.items():
+        if name == 'getMessageCount' and not has_counters:
+            query = COUNT_FALLBACK
+        result = benchmark_query(session, query, params, is_write, repeat)
+        results['queries'][name] = result
+        print(f"  {name:<30} median {result['median_ms']:8.2f} ms  "
+              f"p95 {result['p95_ms']:8.2f} ms  {result['shape']}")
+    return results
+
+def existing_indexes(cur):
+    """Return {(table, first columns...)} for every index in the public schema."""
+    cur.execute("""
+        SELECT t.relname, array_agg(a.attname ORDER BY k.ord)
+        FROM pg_index i
+        JOIN pg_class t ON t.oid = i.indrelid
+        JOIN LATERAL unnest(i.indkey) WITH ORDINALITY AS k(attnum, ord) ON true
+        JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum
+        WHERE t.relnamespace = 'public'::regnamespace
+        GROUP BY i.indexrelid, t.relname
+    """)
+    return {(table, tuple(columns)) for table, columns in cur.fetchall()}
+
+def recommend_indexes(session, runs):
+    """Suggest indexes for queries that sequentially scan large tables."""
+    indexes = existing_indexes(session.cur)
+    session.conn.commit()
+    recommendations = []
+    for advice in INDEX_ADVICE:
+        covered = any(table == advice['table'] and columns[:len(advice['columns'])]
+                      == tuple(advice['columns']) for table, columns in indexes)
+        if covered:
+            continue
+        offenders = sorted({
+            name
+            for run in runs
+            for name in advice['queries']
+            for scan in run['queries'][name]['seq_scans']
+            if scan['table'] == advice['table'] and scan['rows'] >= SEQ_SCAN_THRESHOLD
+        })
+        if offenders:
+            recommendations.append({**advice, 'queries': offenders})
+    return recommendations
+
+def index_statement(advice):
+    """CREATE INDEX CONCURRENTLY statement for a recommendation."""
+    return sql.SQL("CREATE INDEX CONCURRENTLY IF NOT EXISTS {} ON {} ({})").format(
+        sql.Identifier(advice['name']),
+        sql.Identifier(advice['table']),
+        sql.SQL(', ').join(sql.Identifier(column) for column in advice['columns'])
+    )
+
+def apply_indexes(recommendations):
+    """Build recommended indexes without blocking writes."""
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    conn = maintenance_connection(get_database_name())
+    try:
+        with conn.cursor() as cur:
+            for advice in recommendations:
+                started = time.perf_counter()
+                cur.execute(index_statement(advice))
+                print(f"Created {advice['name']} in {time.perf_counter() - started:.1f}s")
+    finally:
+        conn.close()
+
+def plan_changes(runs):
+    """List queries whose plan shape changed between dataset sizes."""
+    changes = []
+    for name in QUERIES:
+        for before, after in zip(runs, runs[1:]):
+            if before['queries'][name]['shape'] != after['queries'][name]['shape']:
+                changes.append({
+                    'query': name,
+                    'from_messages': before['messages'],
+                    'to_messages': after['messages'],
+                    'before': before['queries'][name]['shape'],
+                    'after': after['queries'][name]['shape'],
+                })
+    return changes
+
+def reset_dataset(session, messages):
+    """Replace the dataset with a generated one of the given size."""
+    from seed_data import seed_bulk
+
+    session.cur.execute("TRUNCATE messages, users RESTART IDENTITY CASCADE")
+    profile = seed_generator.get_profile('medium')
+    profile['messages'] = messages
+    profile['users'] = max(messages // 100, 10)
+    seed_bulk(session, profile, hash_cache='.query_bench_hash_cache.json', seed=0)
+    session.conn.commit()
+
+def main():
+    """Parse command-line options and run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark storage-layer queries and advise indexes.")
+    parser.add_argument('--sizes',
+                        help="comma-separated message counts to seed and benchmark in turn")
+    parser.add_argument('--reset-data', action='store_true',
+                        help="confirm that --sizes may replace all users and messages")
+    parser.add_argument('--repeat', type=int, default=5,
+                        help="timed executions per query (default: 5)")
+    parser.add_argument('--output', help="write results as JSON to this file")
+    parser.add_argument('--apply', action='store_true',
+                        help="create recommended indexes with CREATE INDEX CONCURRENTLY")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')] if args.sizes else []
+    if sizes and not args.reset_data:
+        print("Error: --sizes replaces all users and messages; add --reset-data to confirm")
+        sys.exit(1)
+
+    print("Storage Query Benchmark")
+    print("=" * 40)
+
+    runs = []
+    try:
+        with DatabaseSession() as session:
+            for size in sizes or [None]:
+                if size is not None:
+                    print(f"Seeding {size:,} messages...")
+                    reset_dataset(session, size)
+                run = run_benchmarks(session, args.repeat)
+                print(f"-- {run['users']:,} users, {run['messages']:,} messages")
+                runs.append(run)
+
+            recommendations = recommend_indexes(session, runs)
+            for advice in recommendations:
+                advice['statement'] = index_statement(advice).as_string(session.conn)
+    except psycopg2.Error as e:
+        print(f"Database error: {e}")
+        sys.exit(1)
+    finally:
+        close_pool()
+
+    changes = plan_changes(runs)
+    for change in changes:
+        print(f"Plan change for {change['query']} between {change['from_messages']:,} "
+              f"and {change['to_messages']:,} messages:")
+        print(f"  before: {change['before']}")
+        print(f"  after:  {change['after']}")
+
+    for advice in recommendations:
+        print(f"Recommended: {advice['statement']} "
+              f"(sequential scans in {', '.join(advice['queries'])})")
+    if not recommendations:
+        print("No missing indexes detected")
+
+    if args.apply and recommendations:
+        apply_indexes(recommendations)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'runs': runs, 'plan_changes': changes,
+                       'recommendations': recommendations}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
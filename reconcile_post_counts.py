@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Reconcile users.post_count with the real number of messages per user.
+
+True counts come from one GROUP BY over messages joined against users, and
+only users whose stored count differs are touched, in batches of short
+transactions. Cheap enough to run nightly; use --dry-run to only report.
+
+Usage:
+    python reconcile_post_counts.py [--dry-run] [--batch-size N] [--show N]
+"""
+
+import sys
+import time
+import argparse
+import psycopg2
+from db_session import DatabaseSession, close_pool
+
+# Users updated per transaction
+DEFAULT_BATCH_SIZE = 1000
+
+# Drifted users listed in the report
+DEFAULT_SHOW = 10
+
+DRIFT_QUERY = """
+    SELECT u.id, u.username, u.post_count, COALESCE(m.message_count, 0)
+    FROM users u
+    LEFT JOIN (
+        SELECT user_id, COUNT(*) AS message_count
+        FROM messages
+        GROUP BY user_id
+    ) m ON m.user_id = u.id
+    WHERE u.post_count IS DISTINCT FROM COALESCE(m.message_count, 0)
+    ORDER BY u.id
+"""
+
+def apply_corrections(session, rows):
+    """Apply one batch of (id, seen_count, true_count) corrections.
+
+    The stored count is moved by the observed drift rather than overwritten,
+    so a +1/-1 that the app applies between the scan and this update is
+    preserved instead of lost.
+    """
+    session.execute_values("""
+        UPDATE users AS u
+        SET post_count = COALESCE(u.post_count, 0) + v.true_count - COALESCE(v.seen_count, 0)
+        FROM (VALUES %s) AS v(id, seen_count, true_count)
+        WHERE u.id = v.id
+    """, rows, template="(%s, %s::integer, %s::integer)")
+
+def reconcile(session, dry_run=False, batch_size=DEFAULT_BATCH_SIZE, show=DEFAULT_SHOW):
+    """Find drifted users and fix them batch by batch."""
+    started = time.perf_counter()
+    drifted = 0
+    total_drift = 0
+    examples = []
+
+    # WITH HOLD keeps the result set open across the per-batch commits
+    cur = session.conn.cursor('post_count_drift', withhold=True)
+    try:
+        cur.itersize = batch_size
+        cur.execute(DRIFT_QUERY)
+        session.checkpoint()
+
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+
+            drifted += len(rows)
+            total_drift += sum(abs(true_count - (seen or 0)) for _, _, seen, true_count in rows)
+            examples.extend(rows[:max(show - len(examples), 0)])
+
+            if not dry_run:
+                apply_corrections(session, [(user_id, seen, true_count)
+                                            for user_id, _, seen, true_count in rows])
+                session.checkpoint()
+                print(f"  corrected {drifted:,} users")
+    finally:
+        cur.close()
+
+    elapsed = time.perf_counter() - started
+    action = "Found" if dry_run else "Corrected"
+    print(f"{action} {drifted:,} drifted users (total drift {total_drift:,} posts) in {elapsed:.1f}s")
+    for user_id, username, seen, true_count in examples:
+        print(f"  - {username} ({user_id}): stored {seen}, actual {true_count}")
+    return drifted
+
+def main():
+    """Parse command-line options and run the reconciliation."""
+    parser = argparse.ArgumentParser(description="Reconcile users.post_count with real message counts.")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="report drift without updating anything")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"users updated per transaction (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument('--show', type=int, default=DEFAULT_SHOW,
+                        help=f"drifted users to list in the report (default: {DEFAULT_SHOW})")
+    args = parser.parse_args()
+
+    print("Post Count Reconciliation")
+    print("=" * 40)
+
+    try:
+        with DatabaseSession(single_transaction=False) as session:
+            reconcile(session, args.dry_run, args.batch_size, args.show)
+    except psycopg2.Error as e:
+        print(f"Database error: {e}")
+        sys.exit(1)
+    finally:
+        close_pool()
+
+if __name__ == "__main__":
+    main()
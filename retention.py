@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Time-based retention for the messages table.
+
+Deletes messages older than N days in timestamp-ordered batches. Each batch
+is one short transaction: DELETE ... RETURNING user_id, then a single
+batched post_count decrement for the affected users. Progress is saved to
+a state file after every batch, so an interrupted run resumes with the
+same cutoff from where it stopped, and --rate caps rows deleted per second
+so the job can run against the live database.
+
+With --archive, nothing past the archive's high-water mark is deleted, so
+messages that archive_messages.py has not written yet are kept even when
+retention's cutoff is later than the archive run's.
+
+Usage:
+    python retention.py --days 365 [--archive ARCHIVE] [--batch-size N]
+                        [--rate ROWS_PER_SEC] [--state PATH] [--dry-run]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from collections import Counter
+from datetime import datetime, timedelta
+import psycopg2
+from archive_messages import load_manifest
+from db_session import DatabaseSession, close_pool
+
+# Messages deleted per transaction
+DEFAULT_BATCH_SIZE = 2000
+
+# Where progress is kept between runs
+DEFAULT_STATE_PATH = '.retention_state.json'
+
+def load_state(path, days):
+    """Load saved progress, or start a new run with a fresh cutoff."""
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('days') == days:
+            print(f"Resuming run with cutoff {state['cutoff']} "
+                  f"({state['deleted']:,} messages already deleted)")
+            return state
+        print(f"Ignoring state file {path}: it was written for --days {state.get('days')}")
+
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    return {
+        'days': days,
+        'cutoff': cutoff.isoformat(sep=' '),
+        'last_timestamp': None,
+        'last_id': 0,
+        'deleted': 0,
+    }
+
+def archive_ceiling(archive_dir):
+    """Query parameters for the last (timestamp, id) deletes may reach.
+
+    Without an archive the ceiling timestamp is None (no limit). An
+    archive with nothing in it yet returns None: nothing may be deleted.
+    """
+    if not archive_dir:
+        return {'ceiling_timestamp': None, 'ceiling_id': 0}
+    high_water = load_manifest(archive_dir)['high_water']
+    if high_water is None:
+        return None
+    print(f"Deleting only messages archived in {archive_dir} (up to {high_water[0]})")
+    return {'ceiling_timestamp': high_water[0], 'ceiling_id': high_water[1]}
+
+def save_state(path, state):
+    """Atomically persist progress."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+def has_timestamp_index(cur):
+    """Check whether an index leads with messages.timestamp."""
+    cur.execute("""
+        SELECT EXISTS (
+            SELECT 1
+            FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+            WHERE i.indrelid = 'messages'::regclass AND a.attname = 'timestamp'
+        )
+    """)
+    return cur.fetchone()[0]
+
+def delete_batch(session, state, ceiling, batch_size):
+    """Delete one batch of expired messages and fix their authors' counts.
+
+    Returns the number of messages deleted. Rows locked by concurrent
+    requests are skipped and left for the next run.
+    """
+    cur = session.cur
+    cur.execute("""
+        DELETE FROM messages
+        WHERE id IN (
+            SELECT id FROM messages
+            WHERE timestamp < %(cutoff)s
+            AND (%(last_timestamp)s::timestamp IS NULL
+                 OR (timestamp, id) > (%(last_timestamp)s::timestamp, %(last_id)s))
+            AND (%(ceiling_timestamp)s::timestamp IS NULL
+                 OR (timestamp, id) <= (%(ceiling_timestamp)s::timestamp, %(ceiling_id)s))
+            ORDER BY timestamp, id
+            LIMIT %(batch_size)s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING user_id, timestamp, id
+    """, {**state, **ceiling, 'batch_size': batch_size})
+    deleted = cur.fetchall()
+    if not deleted:
+        return 0
+
+    per_user = Counter(user_id for user_id, _, _ in deleted)
+    session.execute_values("""
+        UPDATE users AS u
+        SET post_count = COALESCE(u.post_count, 0) - v.removed
+        FROM (VALUES %s) AS v(id, removed)
+        WHERE u.id = v.id
+    """, list(per_user.items()), template="(%s, %s::integer)")
+
+    last_timestamp, last_id = max((timestamp, message_id) for _, timestamp, message_id in deleted)
+    state['last_timestamp'] = last_timestamp.isoformat(sep=' ')
+    state['last_id'] = last_id
+    state['deleted'] += len(deleted)
+    return len(deleted)
+
+def run_retention(session, state, ceiling, state_path, batch_size=DEFAULT_BATCH_SIZE, rate=0):
+    """Delete expired messages batch by batch until none are left."""
+    if not has_timestamp_index(session.cur):
+        print("Warning: no index on messages.timestamp; every batch will scan the table.")
+        print("Consider: CREATE INDEX CONCURRENTLY ON messages (timestamp, id)")
+    session.checkpoint()
+
+    started = time.perf_counter()
+    run_deleted = 0
+
+    while True:
+        batch_started = time.perf_counter()
+        deleted = delete_batch(session, state, ceiling, batch_size)
+        session.checkpoint()
+        if not deleted:
+            break
+
+        save_state(state_path, state)
+        run_deleted += deleted
+        elapsed = time.perf_counter() - started
+        print(f"  deleted {state['deleted']:,} (up to {state['last_timestamp']}, "
+              f"{run_deleted / max(elapsed, 1e-9):,.0f} rows/sec)")
+
+        if rate:
+            # Sleep off whatever is left of this batch's time budget
+            time.sleep(max(deleted / rate - (time.perf_counter() - batch_started), 0))
+
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    print(f"Retention complete: deleted {state['deleted']:,} messages older than {state['cutoff']}")
+
+def main():
+    """Parse command-line options and run the retention job."""
+    parser = argparse.ArgumentParser(description="Delete messages older than N days in batches.")
+    parser.add_argument('--days', type=int, required=True,
+                        help="delete messages older than this many days")
+    parser.add_argument('--archive', metavar='ARCHIVE',
+                        help="only delete messages archive_messages.py has written to ARCHIVE")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"messages deleted per transaction (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument('--rate', type=float, default=0,
+                        help="maximum messages deleted per second (default: unlimited)")
+    parser.add_argument('--state', default=DEFAULT_STATE_PATH,
+                        help=f"progress file used to resume (default: {DEFAULT_STATE_PATH})")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="only count the messages that would be deleted")
+    args = parser.parse_args()
+
+    print("Message Retention")
+    print("=" * 40)
+
+    try:
+        with DatabaseSession(single_transaction=False) as session:
+            ceiling = archive_ceiling(args.archive)
+            if ceiling is None:
+                print(f"Archive {args.archive} is empty; nothing can be deleted yet")
+                return
+            if args.dry_run:
+                # A preview neither reads nor resumes the saved progress
+                cutoff = (datetime.utcnow() - timedelta(days=args.days)).isoformat(sep=' ')
+                session.cur.execute("""
+                    SELECT COUNT(*) FROM messages
+                    WHERE timestamp < %(cutoff)s
+                    AND (%(ceiling_timestamp)s::timestamp IS NULL
+                         OR (timestamp, id) <= (%(ceiling_timestamp)s::timestamp, %(ceiling_id)s))
+                """, {'cutoff': cutoff, **ceiling})
+                print(f"{session.cur.fetchone()[0]:,} messages are older than {cutoff}")
+                return
+            state = load_state(args.state, args.days)
+            run_retention(session, state, ceiling, args.state, args.batch_size, args.rate)
+    except psycopg2.Error as e:
+        print(f"Database error: {e}")
+        sys.exit(1)
+    finally:
+        close_pool()
+
+if __name__ == "__main__":
+    main()
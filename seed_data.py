@@ -1,24 +1,58 @@
 #!/usr/bin/env python3
 """
 Seed script to populate the database with default users and sample messages.
+
+Pass --metrics PATH for per-phase timings as JSON and --cprofile-dir DIR to
+profile each phase (see instrumentation.py).
 """
 
 import os
+import io
 import sys
+import json
+import time
+import hashlib
+import argparse
 import psycopg2
 from psycopg2 import sql
 import bcrypt
 from datetime import datetime, timedelta
 import random
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor
+import seed_generator
+from db_session import DEFAULT_PAGE_SIZE, DatabaseSession, close_pool, get_pool
+import instrumentation
+from instrumentation import phase
 
-def get_database_url():
-    """Get database URL from environment variables."""
-    database_url = os.getenv('DATABASE_URL')
-    if not database_url:
-        print("Error: DATABASE_URL environment variable not found")
-        print("Make sure you're running this in the same environment as your app")
-        sys.exit(1)
-    return database_url
+# Default password for every seeded account
+SEED_PASSWORD = 'Password123!'
+
+# Rows buffered per COPY statement in bulk mode
+DEFAULT_CHUNK_SIZE = 100_000
+
+SAMPLE_MESSAGES = [
+    "Welcome to our bulletin board! This is a great place to share ideas and connect with others.",
+    "Has anyone tried the new Python 3.12 features? They look amazing, especially the improved error messages!",
+    "Looking for recommendations on good web development tutorials for beginners.",
+    "Just deployed my first web application. Feeling accomplished! 🎉",
+    "Does anyone know the best practices for database optimization in PostgreSQL?",
+    "Coffee or tea? The eternal developer question ☕ What's your preference?",
+    "Working on a machine learning project. Any dataset suggestions for sentiment analysis?",
+    "The new CSS Grid features are really nice for responsive design. Anyone using them?",
+    "Debugging can be frustrating, but finding that elusive bug is so satisfying!",
+    "What's everyone's favorite code editor? I'm curious to hear different opinions.",
+    "Just learned about React hooks. State management is much cleaner now!",
+    "Anyone attending any tech conferences this year? Looking for recommendations.",
+    "CSS Grid vs Flexbox - when do you use which one? Still learning the differences.",
+    "Successfully optimized our API response time by 40% today. Small wins matter!",
+    "What are your thoughts on TypeScript? Worth learning for JavaScript developers?",
+    "Setting up CI/CD pipelines can be tricky. Any good resources to recommend?",
+    "The documentation for this new framework is excellent. Makes learning so much easier!",
+    "Anyone else excited about the upcoming tech developments in AI and web development?",
+    "Code reviews are so valuable for learning. Love seeing different approaches to problems.",
+    "Just finished a challenging algorithm problem. Problem-solving skills are improving!"
+]
 
 def hash_password(password):
     """Hash a password using bcrypt."""
@@ -27,79 +61,171 @@ def hash_password(password):
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
-def create_sample_users():
-    """Create sample users as specified."""
-    database_url = get_database_url()
+def load_hash_cache(cache_path):
+    """Load the on-disk hash cache, keyed by SHA-256 of the plaintext password."""
+    if not cache_path or not os.path.exists(cache_path):
+        return {}
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Warning: ignoring unreadable hash cache {cache_path}: {e}")
+        return {}
+
+def save_hash_cache(cache_path, cache):
+    """Atomically write the hash cache back to disk."""
+    tmp_path = f"{cache_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, cache_path)
+
+def hash_passwords(passwords, workers=None, cache_path=None):
+    """Hash a list of passwords across a process pool.
+
+    Without a cache every password gets its own salt, exactly like
+    hash_password. With cache_path set, identical passwords share one hash
+    that is stored on disk and reused by later runs; cached entries are
+    verified once with bcrypt.checkpw before use.
+    """
+    workers = workers or os.cpu_count() or 1
+    
+    if cache_path:
+        cache = load_hash_cache(cache_path)
+        keys = {password: hashlib.sha256(password.encode('utf-8')).hexdigest()
+                for password in set(passwords)}
+        hashes = {}
+        missing = []
+        for password, key in keys.items():
+            cached = cache.get(key)
+            if cached and bcrypt.checkpw(password.encode('utf-8'), cached.encode('utf-8')):
+                hashes[password] = cached
+            else:
+                missing.append(password)
+        
+        if missing:
+            with ProcessPoolExecutor(max_workers=min(workers, len(missing))) as pool:
+                for password, hashed in zip(missing, pool.map(hash_password, missing)):
+                    hashes[password] = hashed
+                    cache[keys[password]] = hashed
+            save_hash_cache(cache_path, cache)
+        
+        print(f"Hashed {len(missing)} distinct passwords, reused {len(keys) - len(missing)} from cache")
+        return [hashes[password] for password in passwords]
+    
+    if len(passwords) < 2 or workers == 1:
+        return [hash_password(password) for password in passwords]
     
+    started = time.perf_counter()
+    chunksize = max(1, len(passwords) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        hashes = list(pool.map(hash_password, passwords, chunksize=chunksize))
+    
+    elapsed = time.perf_counter() - started
+    print(f"Hashed {len(hashes):,} passwords on {workers} workers "
+          f"in {elapsed:.1f}s ({len(hashes) / max(elapsed, 1e-9):,.1f} hashes/sec)")
+    return hashes
+
+def existing_user_ids(session, usernames):
+    """Return {username: id} for the usernames that already have accounts."""
+    session.cur.execute("SELECT username, id FROM users WHERE username = ANY(%s)",
+                        (list(usernames),))
+    return dict(session.cur.fetchall())
+
+def upsert_users(session, rows, page_size=DEFAULT_PAGE_SIZE):
+    """Insert users idempotently and return {username: (id, inserted)}.
+
+    rows are (username, email, password_hash, role, is_active, post_count)
+    tuples. Each page of rows is one statement: an INSERT ... ON CONFLICT DO
+    NOTHING for the new users, plus a lookup of the ids of those that already
+    exist, so any number of users costs one round trip per page_size users
+    and existing rows are never rewritten. A username taken by a concurrent
+    run after this statement's snapshot is in neither half; it is looked up
+    again afterwards.
+    """
+    returned = session.execute_values("""
+        WITH input (username, email, password_hash, role, is_active, post_count) AS (
+            VALUES %s
+        ), inserted AS (
+            INSERT INTO users (username, email, password_hash, role, is_active, post_count)
+            SELECT username, email, password_hash, role, is_active, post_count FROM input
+            ON CONFLICT (username) DO NOTHING
+            RETURNING id, username
+        )
+        SELECT id, username, true FROM inserted
+        UNION ALL
+        SELECT users.id, users.username, false
+        FROM users JOIN input ON input.username = users.username
+    """, rows, page_size=page_size, fetch=True)
+    upserted = {username: (user_id, inserted) for user_id, username, inserted in returned}
+
+    raced = [row[0] for row in rows if row[0] not in upserted]
+    if raced:
+        for username, user_id in existing_user_ids(session, raced).items():
+            upserted[username] = (user_id, False)
+    return upserted
+
+def create_sample_users(session, hash_cache=None):
+    """Create sample users as specified."""
     # Users to create as specified
     sample_users = [
         {
             'username': 'bob',
             'email': 'bob@example.com',
-            'password': 'Password123!',
+            'password': SEED_PASSWORD,
             'role': 0  # user
         },
         {
             'username': 'alice',
             'email': 'alice@example.com',
-            'password': 'Password123!',
+            'password': SEED_PASSWORD,
             'role': 0  # user
         },
         {
             'username': 'admin',
             'email': 'admin@example.com',
-            'password': 'Password123!',
+            'password': SEED_PASSWORD,
             'role': 1  # admin
         },
         {
             'username': 'canary',
             'email': 'canary@example.com',
-            'password': 'Password123!',
+            'password': SEED_PASSWORD,
             'role': 0  # user
         }
     ]
     
     try:
-        # Connect to database
-        conn = psycopg2.connect(database_url)
-        cur = conn.cursor()
+        # Existing accounts keep their password, so only hash for the rest
+        existing = existing_user_ids(session, [user['username'] for user in sample_users])
+        missing_users = [user for user in sample_users if user['username'] not in existing]
+        upserted = {username: (user_id, False) for username, user_id in existing.items()}
         
+        if missing_users:
+            with phase('hash passwords') as timed:
+                password_hashes = hash_passwords([user['password'] for user in missing_users],
+                                                 cache_path=hash_cache)
+                timed.rows = len(password_hashes)
+            rows = [
+                (user['username'], user['email'], password_hash, user['role'], True, 0)
+                for user, password_hash in zip(missing_users, password_hashes)
+            ]
+            with phase('upsert users') as timed:
+                upserted.update(upsert_users(session, rows))
+                session.checkpoint()
+                timed.rows = len(rows)
         created_users = []
         
         for user_data in sample_users:
-            # Check if user already exists
-            cur.execute("SELECT id, username, email FROM users WHERE username = %s", (user_data['username'],))
-            existing_user = cur.fetchone()
+            user_id, inserted = upserted[user_data['username']]
+            created_users.append(user_id)
             
-            if existing_user:
+            if not inserted:
                 print(f"User {user_data['username']} already exists:")
-                print(f"  - ID: {existing_user[0]}")
-                print(f"  - Email: {existing_user[2]}")
+                print(f"  - ID: {user_id}")
                 print(f"  - Password: {user_data['password']} (original seed password)")
                 print()
-                created_users.append(existing_user[0])  # Store the ID
                 continue
             
-            # Hash the password
-            password_hash = hash_password(user_data['password'])
-            
-            # Insert new user
-            cur.execute("""
-                INSERT INTO users (username, email, password_hash, role, is_active, post_count)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                RETURNING id
-            """, (
-                user_data['username'],
-                user_data['email'],
-                password_hash,
-                user_data['role'],
-                True,
-                0
-            ))
-            
-            user_id = cur.fetchone()[0]
-            created_users.append(user_id)
-            
             role_name = "admin" if user_data['role'] == 1 else "user"
             print(f"Created user: {user_data['username']}")
             print(f"  - ID: {user_id}")
@@ -108,135 +234,230 @@ def create_sample_users():
             print(f"  - Role: {role_name}")
             print()
         
-        # Commit the user creation
-        conn.commit()
         return created_users
         
     except psycopg2.Error as e:
         print(f"Database error while creating users: {e}")
-        if conn:
-            conn.rollback()
         sys.exit(1)
-    except Exception as e:
-        print(f"Unexpected error while creating users: {e}")
-        if conn:
-            conn.rollback()
-        sys.exit(1)
-    finally:
-        if cur:
-            cur.close()
-        if conn:
-            conn.close()
 
-def create_sample_messages(user_ids):
+def create_sample_messages(session, user_ids):
     """Create sample messages from the users."""
     if not user_ids:
         print("No users available to create messages")
         return
     
-    database_url = get_database_url()
+    rows = []
     
-    sample_messages = [
-        "Welcome to our bulletin board! This is a great place to share ideas and connect with others.",
-        "Has anyone tried the new Python 3.12 features? They look amazing, especially the improved error messages!",
-        "Looking for recommendations on good web development tutorials for beginners.",
-        "Just deployed my first web application. Feeling accomplished! 🎉",
-        "Does anyone know the best practices for database optimization in PostgreSQL?",
-        "Coffee or tea? The eternal developer question ☕ What's your preference?",
-        "Working on a machine learning project. Any dataset suggestions for sentiment analysis?",
-        "The new CSS Grid features are really nice for responsive design. Anyone using them?",
-        "Debugging can be frustrating, but finding that elusive bug is so satisfying!",
-        "What's everyone's favorite code editor? I'm curious to hear different opinions.",
-        "Just learned about React hooks. State management is much cleaner now!",
-        "Anyone attending any tech conferences this year? Looking for recommendations.",
-        "CSS Grid vs Flexbox - when do you use which one? Still learning the differences.",
-        "Successfully optimized our API response time by 40% today. Small wins matter!",
-        "What are your thoughts on TypeScript? Worth learning for JavaScript developers?",
-        "Setting up CI/CD pipelines can be tricky. Any good resources to recommend?",
-        "The documentation for this new framework is excellent. Makes learning so much easier!",
-        "Anyone else excited about the upcoming tech developments in AI and web development?",
-        "Code reviews are so valuable for learning. Love seeing different approaches to problems.",
-        "Just finished a challenging algorithm problem. Problem-solving skills are improving!"
-    ]
+    # Create 3-5 messages per user
+    for user_id in user_ids:
+        num_messages = random.randint(3, 5)
+        user_messages = random.sample(SAMPLE_MESSAGES, min(num_messages, len(SAMPLE_MESSAGES)))
+        
+        for content in user_messages:
+            # Create timestamp within the last 30 days
+            days_ago = random.randint(1, 30)
+            hours_ago = random.randint(0, 23)
+            minutes_ago = random.randint(0, 59)
+            timestamp = datetime.utcnow() - timedelta(
+                days=days_ago,
+                hours=hours_ago,
+                minutes=minutes_ago
+            )
+            rows.append((content, user_id, timestamp))
     
     try:
-        # Connect to database
-        conn = psycopg2.connect(database_url)
-        cur = conn.cursor()
-        
-        message_count = 0
-        
-        # Create 3-5 messages per user
-        for user_id in user_ids:
-            num_messages = random.randint(3, 5)
-            user_messages = random.sample(sample_messages, min(num_messages, len(sample_messages)))
-            
-            for content in user_messages:
-                # Create timestamp within the last 30 days
-                days_ago = random.randint(1, 30)
-                hours_ago = random.randint(0, 23)
-                minutes_ago = random.randint(0, 59)
-                timestamp = datetime.utcnow() - timedelta(
-                    days=days_ago,
-                    hours=hours_ago,
-                    minutes=minutes_ago
-                )
-                
-                cur.execute("""
-                    INSERT INTO messages (content, user_id, timestamp)
-                    VALUES (%s, %s, %s)
-                """, (content, user_id, timestamp))
-                
-                message_count += 1
-        
-        # Update post counts for users
-        cur.execute("""
-            UPDATE users 
-            SET post_count = (
-                SELECT COUNT(*) 
-                FROM messages 
-                WHERE messages.user_id = users.id
+        # Insert every message in multi-row statements
+        with phase('insert messages') as timed:
+            session.execute_values(
+                "INSERT INTO messages (content, user_id, timestamp) VALUES %s",
+                rows
             )
-        """)
+            timed.rows = len(rows)
         
-        # Commit the changes
-        conn.commit()
-        print(f"Created {message_count} sample messages")
+        # Update post counts for users
+        with phase('update post counts') as timed:
+            session.cur.execute("""
+                UPDATE users 
+                SET post_count = (
+                    SELECT COUNT(*) 
+                    FROM messages 
+                    WHERE messages.user_id = users.id
+                )
+            """)
+            timed.rows = session.cur.rowcount
+            session.checkpoint()
+        print(f"Created {len(rows)} sample messages")
         print("Updated user post counts")
         
     except psycopg2.Error as e:
         print(f"Database error while creating messages: {e}")
-        if conn:
-            conn.rollback()
-        sys.exit(1)
-    except Exception as e:
-        print(f"Unexpected error while creating messages: {e}")
-        if conn:
-            conn.rollback()
         sys.exit(1)
-    finally:
-        if cur:
-            cur.close()
-        if conn:
-            conn.close()
 
-def verify_database_structure():
-    """Verify that the required tables exist."""
-    database_url = get_database_url()
+def copy_escape(value):
+    """Format a Python value as a PostgreSQL COPY text-format field."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    return (str(value)
+            .replace('\\', '\\\\')
+            .replace('\t', '\\t')
+            .replace('\n', '\\n')
+            .replace('\r', '\\r'))
+
+def copy_rows(session, table, columns, rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream rows into a table with COPY FROM STDIN, chunk_size rows per COPY.
+
+    Prints running throughput after each chunk and returns the number of rows
+    written. Rows may be any iterable, so generators keep memory flat. Each
+    chunk ends with a session checkpoint.
+    """
+    cur = session.cur
+    statement = sql.SQL("COPY {} ({}) FROM STDIN").format(
+        sql.Identifier(table),
+        sql.SQL(', ').join(sql.Identifier(column) for column in columns)
+    ).as_string(cur)
+    
+    started = time.perf_counter()
+    total = 0
+    buffer = io.StringIO()
+    pending = 0
+    
+    def flush():
+        buffer.seek(0)
+        cur.copy_expert(statement, buffer)
+        session.checkpoint()
+        buffer.seek(0)
+        buffer.truncate()
+        elapsed = time.perf_counter() - started
+        print(f"  {table}: {total:,} rows ({total / max(elapsed, 1e-9):,.0f} rows/sec)")
+    
+    for row in rows:
+        buffer.write('\t'.join(copy_escape(value) for value in row))
+        buffer.write('\n')
+        pending += 1
+        total += 1
+        if pending >= chunk_size:
+            flush()
+            pending = 0
+    
+    if pending:
+        flush()
+    
+    return total
+
+def bulk_username(user_prefix, index):
+    """Username of the index-th bulk load-test user (1-based)."""
+    return f"{user_prefix}_{index:06d}"
+
+def generate_bulk_users(user_prefix, user_ids, post_counts, password_hashes):
+    """Yield COPY rows for the bulk load-test users."""
+    rows = zip(user_ids, post_counts, password_hashes)
+    for index, (user_id, post_count, password_hash) in enumerate(rows, start=1):
+        username = bulk_username(user_prefix, index)
+        yield (
+            user_id,
+            username,
+            f"{username}@example.com",
+            password_hash,
+            0,
+            True,
+            post_count
+        )
+
+def seed_bulk(session, profile, chunk_size=DEFAULT_CHUNK_SIZE, user_prefix='loadtest',
+              hash_workers=None, hash_cache=None, seed=None, end=None):
+    """Bulk-load a generated dataset through COPY FROM STDIN.
+
+    profile is a seed_generator profile dict (users, messages, days,
+    zipf_exponent). Post counts are planned before any rows are written, so
+    users are loaded with their final post_count and no follow-up UPDATE is
+    needed. Password hashes are computed up front by hash_passwords.
+    Message timestamps end before end's date (default: today); with a seed
+    and an end the dataset is reproducible.
+    """
+    num_users = profile['users']
+    num_messages = profile['messages']
+    if num_users < 1:
+        print("Bulk mode needs at least one user")
+        sys.exit(1)
+    
+    cur = session.cur
     
     try:
-        conn = psycopg2.connect(database_url)
-        cur = conn.cursor()
+        with phase('check existing users'):
+            cur.execute(
+                "SELECT COUNT(*) FROM users WHERE username LIKE %s",
+                (user_prefix.replace('_', '\\_') + '\\_%',)
+            )
+            existing = cur.fetchone()[0]
+        if existing:
+            print(f"Error: users with prefix '{user_prefix}_' already exist")
+            print("Run cleanup_data.py first or pick another --user-prefix")
+            sys.exit(1)
+        
+        started = time.perf_counter()
+        with phase('plan dataset') as timed:
+            rng = seed_generator.make_rng(seed)
+            user_ids = seed_generator.generate_user_ids(rng, num_users)
+            post_counts = seed_generator.plan_post_counts(
+                rng, num_users, num_messages, profile['zipf_exponent']
+            ).tolist()
+            timed.rows = num_users
+        
+        print(f"Hashing passwords for {num_users:,} users...")
+        with phase('hash passwords') as timed:
+            password_hashes = hash_passwords([SEED_PASSWORD] * num_users, hash_workers, hash_cache)
+            timed.rows = num_users
+        
+        print(f"Loading {num_users:,} users...")
+        with phase('copy users') as timed:
+            user_total = copy_rows(
+                session,
+                'users',
+                ['id', 'username', 'email', 'password_hash', 'role', 'is_active', 'post_count'],
+                generate_bulk_users(user_prefix, user_ids, post_counts, password_hashes),
+                chunk_size
+            )
+            timed.rows = user_total
         
+        # Message generation runs inside this phase, interleaved with COPY
+        print(f"Loading {num_messages:,} messages...")
+        with phase('copy messages') as timed:
+            message_total = copy_rows(
+                session,
+                'messages',
+                ['content', 'user_id', 'timestamp'],
+                chain.from_iterable(seed_generator.generate_messages(
+                    rng, user_ids, post_counts, SAMPLE_MESSAGES, profile['days'], end
+                )),
+                chunk_size
+            )
+            timed.rows = message_total
+        
+        elapsed = time.perf_counter() - started
+        rows = user_total + message_total
+        print(f"Loaded {user_total:,} users and {message_total:,} messages "
+              f"in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/sec)")
+        
+    except psycopg2.Error as e:
+        print(f"Database error during bulk load: {e}")
+        sys.exit(1)
+
+def verify_database_structure(session):
+    """Verify that the required tables exist."""
+    try:
         # Check if required tables exist
-        cur.execute("""
+        session.cur.execute("""
             SELECT table_name 
             FROM information_schema.tables 
             WHERE table_schema = 'public' 
             AND table_name IN ('users', 'messages')
         """)
         
-        existing_tables = [row[0] for row in cur.fetchall()]
+        existing_tables = [row[0] for row in session.cur.fetchall()]
         required_tables = ['users', 'messages']
         
         missing_tables = [table for table in required_tables if table not in existing_tables]
@@ -252,22 +473,16 @@ def verify_database_structure():
     except psycopg2.Error as e:
         print(f"Database error while verifying structure: {e}")
         return False
-    except Exception as e:
-        print(f"Unexpected error while verifying structure: {e}")
-        return False
-    finally:
-        if cur:
-            cur.close()
-        if conn:
-            conn.close()
 
-def seed_database():
+def seed_database(session, hash_cache=None):
     """Main function to seed the database with sample data."""
     print("Database Seeding Utility")
     print("=" * 40)
     
     # Verify database structure first
-    if not verify_database_structure():
+    with phase('verify structure'):
+        verified = verify_database_structure(session)
+    if not verified:
         print("Database structure verification failed. Exiting.")
         sys.exit(1)
     
@@ -275,10 +490,10 @@ def seed_database():
     print()
     
     # Create sample users
-    user_ids = create_sample_users()
+    user_ids = create_sample_users(session, hash_cache)
     
     # Create sample messages
-    create_sample_messages(user_ids)
+    create_sample_messages(session, user_ids)
     
     print()
     print("Database seeding completed!")
@@ -291,5 +506,75 @@ def seed_database():
     print()
     print("You can now log in with any of these accounts!")
 
+def main():
+    """Parse command-line options and run the requested seeding mode."""
+    parser = argparse.ArgumentParser(description="Seed the database with users and messages.")
+    parser.add_argument('--bulk', action='store_true',
+                        help="bulk-load generated users and messages with COPY")
+    parser.add_argument('--profile', choices=sorted(seed_generator.PROFILES), default='small',
+                        help="dataset shape for bulk mode (default: small)")
+    parser.add_argument('--users', type=int,
+                        help="override the profile's number of users")
+    parser.add_argument('--messages', type=int,
+                        help="override the profile's number of messages")
+    parser.add_argument('--seed', type=int,
+                        help="random seed for reproducible datasets (pair it with --end)")
+    parser.add_argument('--end', type=datetime.fromisoformat, metavar='DATE',
+                        help="generate messages in the days before DATE (YYYY-MM-DD; "
+                             "default: today), so --seed reproduces the same timestamps")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"rows per COPY statement (default: {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument('--user-prefix', default='loadtest',
+                        help="username prefix for generated users (default: loadtest)")
+    parser.add_argument('--hash-workers', type=int, default=None,
+                        help="processes used for bcrypt hashing (default: CPU count)")
+    parser.add_argument('--hash-cache', metavar='PATH',
+                        help="reuse one cached hash per distinct seed password, stored in PATH")
+    parser.add_argument('--checkpoint', action='store_true',
+                        help="commit after each phase and COPY chunk instead of "
+                             "running the whole seed as one transaction")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    instrumentation.recorder.configure(args.cprofile_dir)
+    
+    try:
+        with phase('connect'):
+            get_pool()
+        with DatabaseSession(single_transaction=not args.checkpoint) as session:
+            if not args.bulk:
+                seed_database(session, args.hash_cache)
+                with phase('commit'):
+                    session.conn.commit()
+                return
+            
+            print("Database Bulk Seeding Utility")
+            print("=" * 40)
+            
+            with phase('verify structure'):
+                verified = verify_database_structure(session)
+            if not verified:
+                print("Database structure verification failed. Exiting.")
+                sys.exit(1)
+            
+            profile = seed_generator.get_profile(args.profile)
+            if args.users is not None:
+                profile['users'] = args.users
+            if args.messages is not None:
+                profile['messages'] = args.messages
+            
+            seed_bulk(session, profile, args.chunk_size, args.user_prefix,
+                      args.hash_workers, args.hash_cache, args.seed, args.end)
+            with phase('commit'):
+                session.conn.commit()
+    finally:
+        close_pool()
+        # Failed runs still report the phases that completed
+        if args.metrics:
+            instrumentation.recorder.write_report(args.metrics)
+    
+    print()
+    print("Bulk seeding completed!")
+    print(f"All generated users share the password: {SEED_PASSWORD}")
+
 if __name__ == "__main__":
-    seed_database()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,189 @@
+"""
+Synthetic data generator for production-shaped seed datasets.
+
+Activity follows a Zipf-like distribution (a few users write most posts),
+timestamps follow time-of-day and day-of-week traffic curves, and message
+lengths are log-normal up to the 500 character limit of POST /api/messages.
+All distributions are sampled in NumPy batches from a seeded generator, so
+the same seed and end time always produce the same dataset.
+"""
+
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Matches the content length check in POST /api/messages
+MAX_MESSAGE_LENGTH = 500
+
+# Messages generated per NumPy batch
+DEFAULT_BATCH_SIZE = 100_000
+
+# Named dataset shapes
+PROFILES = {
+    'small': {
+        'users': 100,
+        'messages': 10_000,
+        'days': 30,
+        'zipf_exponent': 1.0,
+    },
+    'medium': {
+        'users': 10_000,
+        'messages': 1_000_000,
+        'days': 180,
+        'zipf_exponent': 1.1,
+    },
+    'huge': {
+        'users': 100_000,
+        'messages': 20_000_000,
+        'days': 365,
+        'zipf_exponent': 1.2,
+    },
+}
+
+# Relative traffic per hour of day (UTC): quiet overnight, peaks late
+# morning and in the evening
+HOURLY_WEIGHTS = np.array([
+    2, 1, 1, 1, 1, 2, 4, 6, 8, 10, 11, 10,
+    9, 9, 8, 8, 9, 10, 12, 14, 14, 12, 8, 4,
+], dtype=np.float64)
+
+# Relative traffic per weekday, Monday first
+WEEKDAY_WEIGHTS = np.array([10, 11, 11, 11, 10, 7, 6], dtype=np.float64)
+
+# Log-normal message length parameters (median around 120 characters)
+LENGTH_MEDIAN = 120
+LENGTH_SIGMA = 0.8
+
+
+def get_profile(name):
+    """Return a copy of a named profile."""
+    if name not in PROFILES:
+        raise ValueError(f"Unknown profile '{name}'. Choose from: {', '.join(PROFILES)}")
+    return dict(PROFILES[name])
+
+
+def make_rng(seed=None):
+    """Create the NumPy generator that drives every distribution."""
+    return np.random.default_rng(seed)
+
+
+def generate_user_ids(rng, num_users):
+    """Generate reproducible version 4 UUID strings for users."""
+    raw = rng.integers(0, 256, size=(num_users, 16), dtype=np.uint8)
+    return [str(uuid.UUID(bytes=row.tobytes(), version=4)) for row in raw]
+
+
+def plan_post_counts(rng, num_users, num_messages, zipf_exponent=1.1):
+    """Spread num_messages over users with Zipf-like weights.
+
+    Ranks are shuffled so the most active posters are random users rather
+    than the first ones created. Returns an int64 array of per-user counts
+    that sums to num_messages.
+    """
+    ranks = np.arange(1, num_users + 1, dtype=np.float64)
+    weights = ranks ** -zipf_exponent
+    rng.shuffle(weights)
+    return rng.multinomial(num_messages, weights / weights.sum())
+
+
+def _day_probabilities(start, days):
+    """Probability of each day in the window from its weekday weight."""
+    weekdays = (np.arange(days) + start.weekday()) % 7
+    weights = WEEKDAY_WEIGHTS[weekdays]
+    return weights / weights.sum()
+
+
+def generate_timestamps(rng, total, start, days, batch_size=DEFAULT_BATCH_SIZE):
+    """Yield total timestamps in [start, start + days) in ascending order.
+
+    Messages per day are drawn up front, then each day's timestamps are
+    sampled and sorted, so rows come out in the order a live board would
+    write them. Yields datetime64[s] arrays of up to batch_size entries.
+    """
+    day_counts = rng.multinomial(total, _day_probabilities(start, days))
+    hour_probabilities = HOURLY_WEIGHTS / HOURLY_WEIGHTS.sum()
+    origin = np.datetime64(start, 's')
+    pending = np.empty(0, dtype=np.int64)
+    for day, count in enumerate(day_counts.tolist()):
+        hour = rng.choice(24, size=count, p=hour_probabilities)
+        second = rng.integers(0, 3600, size=count)
+        offsets = np.sort(day * 86400 + hour * 3600 + second)
+        pending = np.concatenate((pending, offsets))
+        while len(pending) >= batch_size:
+            yield origin + pending[:batch_size].astype('timedelta64[s]')
+            pending = pending[batch_size:]
+    if len(pending):
+        yield origin + pending.astype('timedelta64[s]')
+
+
+def generate_lengths(rng, count):
+    """Sample message lengths from a log-normal clipped to 1..500."""
+    lengths = rng.lognormal(np.log(LENGTH_MEDIAN), LENGTH_SIGMA, size=count)
+    return np.clip(lengths.astype(np.int64), 1, MAX_MESSAGE_LENGTH)
+
+
+def build_corpus(texts, rng, min_length=MAX_MESSAGE_LENGTH * 20):
+    """Build a long word stream to slice message bodies from.
+
+    Returns the corpus string and the offsets of every word start that
+    leaves room for a full-length message.
+    """
+    words = ' '.join(texts).split()
+    word_lengths = np.array([len(word) for word in words], dtype=np.int64)
+    corpus_words = []
+    corpus_lengths = []
+    size = 0
+    while size < min_length:
+        order = rng.permutation(len(words))
+        corpus_words.extend(words[i] for i in order)
+        corpus_lengths.append(word_lengths[order])
+        size += int(word_lengths.sum()) + len(words)
+    corpus = ' '.join(corpus_words)
+    starts = np.concatenate(([0], np.cumsum(np.concatenate(corpus_lengths) + 1)[:-1]))
+    return corpus, starts[starts <= len(corpus) - MAX_MESSAGE_LENGTH]
+
+
+def generate_messages(rng, user_ids, post_counts, texts, days=30, end=None,
+                      batch_size=DEFAULT_BATCH_SIZE):
+    """Yield batches of (content, user_id, timestamp) rows.
+
+    Each batch is sampled with vectorized NumPy calls; only the final string
+    slicing happens per row. Rows come out in timestamp order with authors
+    interleaved, so insertion order (and messages.id) follows time as it
+    does in production. Per-user totals match post_counts exactly.
+    Timestamps cover the days whole days before end's date and are ISO 8601
+    strings that PostgreSQL parses directly. Pass end for a reproducible
+    dataset; it defaults to now.
+    """
+    end = end or datetime.utcnow()
+    start = end.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days)
+    corpus, word_starts = build_corpus(texts, rng)
+    # The server limits String.length, which counts characters outside the
+    # BMP (emoji) as two UTF-16 units; prefix sums of those per corpus offset
+    code_points = np.frombuffer(corpus.encode('utf-32-le'), dtype=np.uint32)
+    astral = np.concatenate(([0], np.cumsum(code_points > 0xFFFF)))
+
+    # One entry per message naming its author, shuffled across the timeline
+    authors = rng.permutation(np.repeat(np.arange(len(user_ids)), post_counts))
+    total = len(authors)
+
+    batch_start = 0
+    for timestamps in generate_timestamps(rng, total, start, days, batch_size):
+        count = len(timestamps)
+        batch_authors = authors[batch_start:batch_start + count]
+        batch_start += count
+        timestamp_strings = np.datetime_as_string(timestamps, unit='s')
+
+        lengths = generate_lengths(rng, count)
+        offsets = rng.choice(word_starts, size=count)
+        # Measure length in UTF-16 units so no body exceeds the server limit
+        stops = offsets + lengths
+        stops -= astral[stops] - astral[offsets]
+
+        yield [
+            (corpus[offset:stop].strip() or corpus[offset], user_ids[author], timestamp)
+            for offset, stop, author, timestamp
+            in zip(offsets.tolist(), stops.tolist(), batch_authors.tolist(),
+                   timestamp_strings.tolist())
+        ]
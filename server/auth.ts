@@ -3,8 +3,8 @@ import { Strategy as LocalStrategy } from "passport-local";
 import { Express, RequestHandler } from "express";
 import session from "express-session";
 import connectPg from "connect-pg-simple";
-import bcrypt from "bcryptjs";
 import { storage } from "./storage";
+import { passwordHasher, HasherBusyError } from "./passwordHasher";
 import { User as SelectUser, insertUserSchema } from "@shared/schema";
 import { z } from "zod";
 
@@ -61,7 +61,7 @@ export function setupAuth(app: Express) {
             return done(null, false, { message: "Invalid username or password" });
           }
 
-          const isValidPassword = await bcrypt.compare(password, user.passwordHash);
+          const isValidPassword = await passwordHasher.compare(password, user.passwordHash);
           if (!isValidPassword) {
             return done(null, false, { message: "Invalid username or password" });
           }
@@ -70,6 +70,21 @@ export function setupAuth(app: Express) {
             return done(null, false, { message: "Account is disabled" });
           }
 
+          // Upgrade hashes made at another cost in the background; a failure
+          // (e.g. a full hashing queue) just leaves it for the next login.
+          // Only the hash just verified is replaced, so a password changed
+          // meanwhile is never overwritten with the old one.
+          if (passwordHasher.needsRehash(user.passwordHash)) {
+            const verifiedHash = user.passwordHash;
+            passwordHasher
+              .hash(password)
+              .then((passwordHash) => storage.updatePasswordHash(user!.id, passwordHash, verifiedHash))
+              .then((updated) => {
+                if (updated) passwordHasher.recordRehash();
+              })
+              .catch((error) => console.error("Password rehash failed:", error));
+          }
+
           return done(null, user);
         } catch (error) {
           return done(error);
@@ -152,6 +167,9 @@ export function setupAuth(app: Express) {
           errors: error.errors 
         });
       }
+      if (error instanceof HasherBusyError) {
+        return res.status(503).set("Retry-After", "1").json({ message: error.message });
+      }
       console.error("Registration error:", error);
       res.status(500).json({ message: "Failed to register user" });
     }
@@ -160,6 +178,9 @@ export function setupAuth(app: Express) {
   // Login route
   app.post("/api/login", (req, res, next) => {
     passport.authenticate("local", (err: any, user: any, info: any) => {
+      if (err instanceof HasherBusyError) {
+        return res.status(503).set("Retry-After", "1").json({ message: err.message });
+      }
       if (err) {
         return next(err);
       }
@@ -1,11 +1,15 @@
 import axios from 'axios';
 import sharp from 'sharp';
+import crypto from 'crypto';
 import fs from 'fs/promises';
 import path from 'path';
 
 const AVATAR_DIR = path.join(process.cwd(), 'avatars');
 const MAX_FILE_SIZE = 5 * 1024 * 1024; // 5MB
 const SUPPORTED_FORMATS = ['image/jpeg', 'image/png', 'image/webp', 'image/gif'];
+// Files touched more recently than this are never deleted, so a concurrent
+// upload of the same image cannot lose its file (avatar_gc.py collects them later)
+const DELETE_GRACE_MS = 10 * 60 * 1000; // 10 minutes
 
 // Ensure avatar directory exists
 export async function ensureAvatarDir(): Promise<void> {
@@ -17,7 +21,7 @@ export async function ensureAvatarDir(): Promise<void> {
 }
 
 // Validate and download image from URL
-export async function downloadAndProcessAvatar(imageUrl: string, userId: string): Promise<string> {
+export async function downloadAndProcessAvatar(imageUrl: string): Promise<string> {
   try {
     // Validate URL format
     const url = new URL(imageUrl);
@@ -45,16 +49,28 @@ export async function downloadAndProcessAvatar(imageUrl: string, userId: string)
     await ensureAvatarDir();
 
     // Process image with sharp - resize and optimize
-    const filename = `${userId}_${Date.now()}.webp`;
-    const filepath = path.join(AVATAR_DIR, filename);
-
-    await sharp(response.data)
+    const processed = await sharp(response.data)
       .resize(200, 200, {
         fit: 'cover',
         position: 'center'
       })
       .webp({ quality: 85 })
-      .toFile(filepath);
+      .toBuffer();
+
+    // Content-addressed file name: identical images share one file
+    const filename = `${crypto.createHash('sha256').update(processed).digest('hex')}.webp`;
+    const filepath = path.join(AVATAR_DIR, filename);
+
+    try {
+      // Already stored - refresh mtime so a pending delete skips it
+      const now = new Date();
+      await fs.utimes(filepath, now, now);
+    } catch {
+      // Write to a temp file and rename so readers never see a partial file
+      const tmpPath = `${filepath}.${process.pid}.${Date.now()}.tmp`;
+      await fs.writeFile(tmpPath, processed);
+      await fs.rename(tmpPath, filepath);
+    }
 
     // Return the relative path to store in database
     return `/avatars/${filename}`;
@@ -67,12 +83,17 @@ export async function downloadAndProcessAvatar(imageUrl: string, userId: string)
   }
 }
 
-// Delete old avatar file
+// Delete old avatar file. Callers must first check that no user still
+// references it, since content-addressed files are shared.
 export async function deleteAvatarFile(avatarPath: string): Promise<void> {
   try {
     if (avatarPath && avatarPath.startsWith('/avatars/')) {
       const filename = path.basename(avatarPath);
       const filepath = path.join(AVATAR_DIR, filename);
+      const stats = await fs.stat(filepath);
+      if (Date.now() - stats.mtimeMs < DELETE_GRACE_MS) {
+        return;
+      }
       await fs.unlink(filepath);
     }
   } catch (error) {
@@ -0,0 +1,146 @@
+import type { Response } from "express";
+import type { PoolClient } from "@neondatabase/serverless";
+import type { FeedEvent } from "@shared/schema";
+import { pool } from "./db";
+import { storage, type MessageCreated, type MessageDeleted } from "./storage";
+
+const FEED_CHANNEL = "feed_events";
+// NOTIFY rejects payloads of 8000 bytes or more
+const MAX_PAYLOAD_BYTES = 7999;
+// Keeps idle connections open through proxies that time out silent streams
+const HEARTBEAT_MS = 25_000;
+const RECONNECT_MS = 2_000;
+
+// Fans feed events out to Server-Sent Events clients. Writers publish with
+// NOTIFY, and every server instance holds one LISTEN connection (only while
+// it has subscribers) and relays each notification to its own clients, so
+// a new post costs one notification instead of one page query per viewer.
+class FeedEventHub {
+  private clients = new Set<Response>();
+  private listener?: PoolClient;
+  private connecting = false;
+  private heartbeat?: NodeJS.Timeout;
+
+  // An event too large to NOTIFY is replaced by a resync, so clients refetch
+  // instead of silently missing it
+  async publish(event: FeedEvent): Promise<void> {
+    let payload = JSON.stringify(event);
+    if (Buffer.byteLength(payload) > MAX_PAYLOAD_BYTES) {
+      console.warn(`Feed event ${event.type} is too large to publish; sending resync`);
+      payload = JSON.stringify({ type: "resync" });
+    }
+    await pool.query("SELECT pg_notify($1, $2)", [FEED_CHANNEL, payload]);
+  }
+
+  subscribe(res: Response): void {
+    res.writeHead(200, {
+      "Content-Type": "text/event-stream",
+      "Cache-Control": "no-cache, no-transform",
+      Connection: "keep-alive",
+      "X-Accel-Buffering": "no",
+    });
+    res.write(`retry: ${RECONNECT_MS}\n\n`);
+
+    this.clients.add(res);
+    res.on("close", () => {
+      this.clients.delete(res);
+      if (this.clients.size === 0) this.stop();
+    });
+
+    if (!this.heartbeat) {
+      this.heartbeat = setInterval(() => this.write(": ping\n\n"), HEARTBEAT_MS);
+      this.heartbeat.unref();
+    }
+    this.listen();
+  }
+
+  private write(frame: string): void {
+    for (const res of Array.from(this.clients)) res.write(frame);
+  }
+
+  private async listen(): Promise<void> {
+    if (this.listener || this.connecting) return;
+    this.connecting = true;
+    let client: PoolClient | undefined;
+    try {
+      client = await pool.connect();
+      this.listener = client;
+      client.on("notification", (msg) => {
+        if (msg.channel === FEED_CHANNEL && msg.payload) {
+          this.write(`data: ${msg.payload}\n\n`);
+        }
+      });
+      client.on("error", (error) => {
+        console.error("Feed listener error:", error);
+        this.release(client!, error);
+        // Anything published while reconnecting is lost; clients refetch
+        this.write(`data: ${JSON.stringify({ type: "resync" })}\n\n`);
+        this.retry();
+      });
+      await client.query(`LISTEN ${FEED_CHANNEL}`);
+    } catch (error) {
+      console.error("Failed to start feed listener:", error);
+      if (client) this.release(client, error as Error);
+      this.retry();
+    } finally {
+      this.connecting = false;
+    }
+
+    // The last subscriber may have left while we were connecting
+    if (this.clients.size === 0) this.stop();
+  }
+
+  private retry(): void {
+    setTimeout(() => {
+      if (this.clients.size > 0) this.listen();
+    }, RECONNECT_MS).unref();
+  }
+
+  private stop(): void {
+    clearInterval(this.heartbeat);
+    this.heartbeat = undefined;
+    const client = this.listener;
+    if (client && !this.connecting) {
+      client
+        .query(`UNLISTEN ${FEED_CHANNEL}`)
+        .then(() => this.release(client))
+        .catch((error) => this.release(client, error))
+        // Someone subscribed while we were unlistening
+        .then(() => this.clients.size > 0 && this.listen());
+    }
+  }
+
+  // Returns the connection to the pool once, whichever path gets here first
+  private release(client: PoolClient, error?: Error): void {
+    if (this.listener !== client) return;
+    this.listener = undefined;
+    client.release(error);
+  }
+}
+
+export const feedEvents = new FeedEventHub();
+
+// The write statement read the count already; only without the counter
+// (python message_counter.py install) does publishing need a query
+function messageCount(totalCount: number | null): Promise<number> {
+  return totalCount === null ? storage.getMessageCount() : Promise.resolve(totalCount);
+}
+
+// Publish helpers; run after the write has committed and never fail the request
+export function publishMessageCreated({ message, totalCount }: MessageCreated): void {
+  messageCount(totalCount)
+    .then((count) => feedEvents.publish({ type: "message.created", message, totalCount: count }))
+    .catch((error) => console.error("Failed to publish message.created:", error));
+}
+
+export function publishMessageDeleted(id: number, { totalCount }: MessageDeleted): void {
+  messageCount(totalCount)
+    .then((count) => feedEvents.publish({ type: "message.deleted", id, totalCount: count }))
+    .catch((error) => console.error("Failed to publish message.deleted:", error));
+}
+
+export function publishFeedResync(): void {
+  feedEvents
+    .publish({ type: "resync" })
+    .catch((error) => console.error("Failed to publish resync:", error));
+}
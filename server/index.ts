@@ -1,6 +1,7 @@
 import express, { type Request, Response, NextFunction } from "express";
 import { registerRoutes } from "./routes";
 import { setupVite, serveStatic, log } from "./vite";
+import { storage } from "./storage";
 
 const app = express();
 app.use(express.json());
@@ -39,6 +40,15 @@ app.use((req, res, next) => {
 (async () => {
   const server = await registerRoutes(app);
 
+  storage.isSearchTriggerInstalled()
+    .then((installed) => {
+      if (!installed) {
+        log("warning: search trigger is missing, new messages will not be searchable; " +
+          "run python message_search.py install");
+      }
+    })
+    .catch((error) => console.error("Failed to check the search trigger:", error));
+
   app.use((err: any, _req: Request, res: Response, _next: NextFunction) => {
     const status = err.status || err.statusCode || 500;
     const message = err.message || "Internal Server Error";
@@ -0,0 +1,190 @@
+import { Worker } from "node:worker_threads";
+import { createRequire } from "node:module";
+import os from "node:os";
+
+// Thrown when the queue is full; the error handler turns it into a 503
+export class HasherBusyError extends Error {
+  status = 503;
+
+  constructor() {
+    super("Server is busy, please try again shortly");
+    this.name = "HasherBusyError";
+  }
+}
+
+export interface PasswordHasherStats {
+  workers: number;
+  cost: number;
+  maxQueue: number;
+  queued: number;
+  inFlight: number;
+  completed: number;
+  failed: number;
+  rejected: number;
+  rehashed: number;
+  avgWaitMs: number;
+  avgRunMs: number;
+}
+
+type Job = {
+  op: "hash" | "compare";
+  password: string;
+  hash?: string;
+  enqueuedAt: number;
+  resolve: (result: any) => void;
+  reject: (error: Error) => void;
+};
+
+type Slot = {
+  worker: Worker;
+  job?: Job & { startedAt: number };
+};
+
+// Runs as CommonJS inside each worker; bcryptjs is resolved by the main
+// thread so this works both under tsx and from the esbuild bundle
+const WORKER_SOURCE = `
+const { parentPort, workerData } = require("node:worker_threads");
+const bcrypt = require(workerData.bcryptPath);
+parentPort.on("message", ({ op, password, hash, cost }) => {
+  try {
+    const result = op === "hash"
+      ? bcrypt.hashSync(password, cost)
+      : bcrypt.compareSync(password, hash);
+    parentPort.postMessage({ result });
+  } catch (error) {
+    parentPort.postMessage({ error: String((error && error.message) || error) });
+  }
+});
+`;
+
+const BCRYPT_COST = /^\$2[abxy]?\$(\d{2})\$/;
+
+// bcrypt hashing on a pool of worker threads. Each worker runs one job at
+// a time; jobs wait in a bounded FIFO queue and are rejected with
+// HasherBusyError once it is full, so a login storm cannot queue unbounded
+// work or block the event loop.
+export class PasswordHasher {
+  private slots: Slot[] = [];
+  private queue: Job[] = [];
+  private bcryptPath = createRequire(import.meta.url).resolve("bcryptjs");
+  private completed = 0;
+  private failed = 0;
+  private rejected = 0;
+  private rehashed = 0;
+  private totalWaitMs = 0;
+  private totalRunMs = 0;
+
+  constructor(
+    readonly size: number,
+    readonly cost: number,
+    readonly maxQueue: number,
+  ) {}
+
+  hash(password: string): Promise<string> {
+    return this.submit("hash", password);
+  }
+
+  compare(password: string, hash: string): Promise<boolean> {
+    return this.submit("compare", password, hash);
+  }
+
+  // True when a hash was made with a different cost than the configured one
+  needsRehash(hash: string): boolean {
+    const match = BCRYPT_COST.exec(hash);
+    return !match || parseInt(match[1], 10) !== this.cost;
+  }
+
+  recordRehash(): void {
+    this.rehashed++;
+  }
+
+  stats(): PasswordHasherStats {
+    return {
+      workers: this.size,
+      cost: this.cost,
+      maxQueue: this.maxQueue,
+      queued: this.queue.length,
+      inFlight: this.slots.filter(slot => slot.job).length,
+      completed: this.completed,
+      failed: this.failed,
+      rejected: this.rejected,
+      rehashed: this.rehashed,
+      avgWaitMs: this.completed ? this.totalWaitMs / this.completed : 0,
+      avgRunMs: this.completed ? this.totalRunMs / this.completed : 0,
+    };
+  }
+
+  private submit(op: Job["op"], password: string, hash?: string): Promise<any> {
+    if (this.slots.length === 0) {
+      for (let i = 0; i < this.size; i++) this.slots.push(this.spawn());
+    }
+    if (this.queue.length >= this.maxQueue) {
+      this.rejected++;
+      return Promise.reject(new HasherBusyError());
+    }
+
+    return new Promise((resolve, reject) => {
+      this.queue.push({ op, password, hash, enqueuedAt: Date.now(), resolve, reject });
+      this.dispatch();
+    });
+  }
+
+  private spawn(): Slot {
+    const worker = new Worker(WORKER_SOURCE, {
+      eval: true,
+      workerData: { bcryptPath: this.bcryptPath },
+    });
+
+    const slot: Slot = { worker };
+    worker.on("message", ({ result, error }) => {
+      const job = slot.job!;
+      slot.job = undefined;
+      worker.unref();
+      const finishedAt = Date.now();
+      this.totalWaitMs += job.startedAt - job.enqueuedAt;
+      this.totalRunMs += finishedAt - job.startedAt;
+      if (error) {
+        this.failed++;
+        job.reject(new Error(error));
+      } else {
+        this.completed++;
+        job.resolve(result);
+      }
+      this.dispatch();
+    });
+    worker.on("error", (error) => {
+      // A crashed worker is replaced; only its own job fails
+      slot.job?.reject(error);
+      this.failed += slot.job ? 1 : 0;
+      this.slots[this.slots.indexOf(slot)] = this.spawn();
+      this.dispatch();
+    });
+    // Only busy workers keep the process alive (see dispatch); unref must
+    // come after the listeners, which would otherwise ref the worker again
+    worker.unref();
+    return slot;
+  }
+
+  private dispatch(): void {
+    for (const slot of this.slots) {
+      if (this.queue.length === 0) return;
+      if (slot.job) continue;
+
+      const job = this.queue.shift()!;
+      slot.job = { ...job, startedAt: Date.now() };
+      slot.worker.ref();
+      slot.worker.postMessage({
+        op: job.op,
+        password: job.password,
+        hash: job.hash,
+        cost: this.cost,
+      });
+    }
+  }
+}
+
+export const passwordHasher = new PasswordHasher(
+  parseInt(process.env.BCRYPT_WORKERS || "", 10) || Math.max(os.cpus().length - 1, 1),
+  parseInt(process.env.BCRYPT_COST || "12", 10),
+  parseInt(process.env.BCRYPT_MAX_QUEUE || "256", 10),
+);
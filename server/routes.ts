@@ -1,10 +1,13 @@
 import type { Express } from "express";
 import { createServer, type Server } from "http";
-import { storage } from "./storage";
+import { storage, decodeMessageCursor } from "./storage";
 import { setupAuth, isAuthenticated } from "./auth";
 import { insertMessageSchema, updateProfileSchema } from "@shared/schema";
 import { z } from "zod";
 import { downloadAndProcessAvatar, deleteAvatarFile } from "./avatarUtils";
+import { userCache } from "./userCache";
+import { passwordHasher, HasherBusyError } from "./passwordHasher";
+import { feedEvents, publishMessageCreated, publishMessageDeleted, publishFeedResync } from "./feedEvents";
 import path from "path";
 
 export async function registerRoutes(app: Express): Promise<Server> {
@@ -21,7 +24,9 @@ export async function registerRoutes(app: Express): Promise<Server> {
       return res.status(404).send('File not found');
     }
     
-    res.sendFile(filepath, (err) => {
+    // Avatar URLs never change content (content-addressed or timestamped
+    // names), so browsers and proxies may cache them indefinitely
+    res.sendFile(filepath, { maxAge: '1y', immutable: true }, (err) => {
       if (err) {
         res.status(404).send('Avatar not found');
       }
@@ -32,6 +37,20 @@ export async function registerRoutes(app: Express): Promise<Server> {
   app.get('/api/messages', isAuthenticated, async (req, res) => {
     try {
       const limit = parseInt(req.query.limit as string) || 20;
+
+      // Cursor mode: ?cursor= for the first page, then the returned nextCursor
+      if (typeof req.query.cursor === 'string') {
+        const after = req.query.cursor ? decodeMessageCursor(req.query.cursor) : undefined;
+        if (req.query.cursor && !after) {
+          return res.status(400).json({ message: "Invalid cursor" });
+        }
+
+        const page = await storage.getMessagesPage(limit, after);
+        const totalCount = await storage.getMessageCount();
+
+        return res.json({ ...page, totalCount });
+      }
+
       const offset = parseInt(req.query.offset as string) || 0;
       
       const messages = await storage.getMessages(limit, offset);
@@ -44,6 +63,30 @@ export async function registerRoutes(app: Express): Promise<Server> {
     }
   });
 
+  // Server-Sent Events stream of FeedEvent (see server/feedEvents.ts)
+  app.get('/api/messages/stream', isAuthenticated, (req, res) => {
+    feedEvents.subscribe(res);
+  });
+
+  // Ranked full-text search: ?q=...&limit=&offset=
+  app.get('/api/messages/search', isAuthenticated, async (req, res) => {
+    try {
+      const query = typeof req.query.q === 'string' ? req.query.q.trim() : '';
+      if (!query || query.length > 200) {
+        return res.status(400).json({ message: "Search query must be 1-200 characters" });
+      }
+
+      const limit = parseInt(req.query.limit as string) || 20;
+      const offset = parseInt(req.query.offset as string) || 0;
+
+      const results = await storage.searchMessages(query, limit, offset);
+      res.json(results);
+    } catch (error) {
+      console.error("Error searching messages:", error);
+      res.status(500).json({ message: "Failed to search messages" });
+    }
+  });
+
   app.post('/api/messages', isAuthenticated, async (req: any, res) => {
     try {
       const userId = req.user.id;
@@ -57,8 +100,9 @@ export async function registerRoutes(app: Express): Promise<Server> {
         return res.status(400).json({ message: "Message too long (max 500 characters)" });
       }
 
-      const message = await storage.createMessage(messageData);
-      res.status(201).json(message);
+      const created = await storage.createMessage(messageData);
+      res.status(201).json(created.message);
+      publishMessageCreated(created);
     } catch (error) {
       if (error instanceof z.ZodError) {
         return res.status(400).json({ message: "Invalid message data", errors: error.errors });
@@ -73,13 +117,14 @@ export async function registerRoutes(app: Express): Promise<Server> {
       const messageId = parseInt(req.params.id);
       const userId = req.user.id;
       
-      const success = await storage.deleteMessage(messageId, userId);
+      const deleted = await storage.deleteMessage(messageId, userId);
       
-      if (!success) {
+      if (!deleted) {
         return res.status(403).json({ message: "Not authorized to delete this message" });
       }
       
       res.json({ message: "Message deleted successfully" });
+      publishMessageDeleted(messageId, deleted);
     } catch (error) {
       console.error("Error deleting message:", error);
       res.status(500).json({ message: "Failed to delete message" });
@@ -104,6 +149,23 @@ export async function registerRoutes(app: Express): Promise<Server> {
     }
   });
 
+  app.get('/api/admin/metrics', isAuthenticated, async (req: any, res) => {
+    try {
+      const currentUser = await storage.getUser(req.user.id);
+      if (!currentUser || currentUser.role !== 1) {
+        return res.status(403).json({ message: "Admin access required" });
+      }
+
+      res.json({
+        userCache: userCache.stats(),
+        passwordHasher: passwordHasher.stats(),
+      });
+    } catch (error) {
+      console.error("Error fetching metrics:", error);
+      res.status(500).json({ message: "Failed to fetch metrics" });
+    }
+  });
+
   app.put('/api/admin/users/:id/role', isAuthenticated, async (req: any, res) => {
     try {
       const adminId = req.user.id;
@@ -140,6 +202,8 @@ export async function registerRoutes(app: Express): Promise<Server> {
       
       await storage.deleteUser(targetUserId);
       res.json({ message: "User deleted successfully" });
+      // Removes a batch of messages at once; viewers reload the page
+      publishFeedResync();
     } catch (error) {
       console.error("Error deleting user:", error);
       res.status(500).json({ message: "Failed to delete user" });
@@ -182,13 +246,13 @@ export async function registerRoutes(app: Express): Promise<Server> {
       const oldAvatarUrl = currentUser?.avatarUrl;
 
       // Download and process the image
-      const avatarPath = await downloadAndProcessAvatar(imageUrl, userId);
+      const avatarPath = await downloadAndProcessAvatar(imageUrl);
       
       // Update user avatar in database
       await storage.updateUserAvatar(userId, avatarPath);
       
-      // Delete old avatar file if it exists
-      if (oldAvatarUrl && oldAvatarUrl !== avatarPath) {
+      // Delete old avatar file if no other user shares it
+      if (oldAvatarUrl && oldAvatarUrl !== avatarPath && !(await storage.isAvatarReferenced(oldAvatarUrl))) {
         await deleteAvatarFile(oldAvatarUrl);
       }
 
@@ -219,6 +283,9 @@ export async function registerRoutes(app: Express): Promise<Server> {
       
       res.json({ message: "Password changed successfully" });
     } catch (error) {
+      if (error instanceof HasherBusyError) {
+        return res.status(503).set("Retry-After", "1").json({ message: error.message });
+      }
       console.error("Error changing password:", error);
       res.status(500).json({ message: "Failed to change password" });
     }
@@ -228,6 +295,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
     try {
       const userId = req.user.id;
       await storage.deleteUser(userId);
+      publishFeedResync();
       
       req.logout((err: any) => {
         if (err) {
@@ -1,17 +1,65 @@
 import {
   users,
   messages,
+  counters,
   type User,
   type UpsertUser,
   type InsertUser,
   type Message,
   type InsertMessage,
   type MessageWithUser,
+  type MessagePage,
+  type MessageSearchPage,
+  type FeedAuthor,
   type UpdateProfile,
 } from "@shared/schema";
 import { db } from "./db";
-import { eq, desc, count, sql } from "drizzle-orm";
-import bcrypt from "bcryptjs";
+import { userCache } from "./userCache";
+import { and, eq, desc, count, sql } from "drizzle-orm";
+import { passwordHasher } from "./passwordHasher";
+
+// Position in the feed: the (timestamp, id) of the last message on a page.
+// The timestamp is kept as Postgres text so no microseconds are lost.
+export interface MessageCursor {
+  timestamp: string;
+  id: number;
+}
+
+// A committed message write plus what its feed event needs, read by the
+// write statement itself: the author as the feed shows them afterwards and
+// the message count (null when the counter is not installed)
+export interface MessageCreated {
+  message: MessageWithUser;
+  totalCount: number | null;
+}
+
+export interface MessageDeleted {
+  totalCount: number | null;
+}
+
+const CURSOR_TIMESTAMP = /^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(\.\d{1,6})?$/;
+
+export function encodeMessageCursor(cursor: MessageCursor): string {
+  return Buffer.from(JSON.stringify([cursor.timestamp, cursor.id])).toString("base64url");
+}
+
+export function decodeMessageCursor(value: string): MessageCursor | undefined {
+  try {
+    const decoded = JSON.parse(Buffer.from(value, "base64url").toString("utf8"));
+    if (
+      Array.isArray(decoded) &&
+      decoded.length === 2 &&
+      typeof decoded[0] === "string" &&
+      CURSOR_TIMESTAMP.test(decoded[0]) &&
+      Number.isInteger(decoded[1])
+    ) {
+      return { timestamp: decoded[0], id: decoded[1] };
+    }
+  } catch {
+    // Fall through: not a cursor we issued
+  }
+  return undefined;
+}
 
 export interface IStorage {
   // User operations (mandatory for Replit Auth)
@@ -23,17 +71,22 @@ export interface IStorage {
   getUserByEmail(email: string): Promise<User | undefined>;
   createUser(user: InsertUser): Promise<User>;
   updateUserPostCount(userId: string, increment: number): Promise<void>;
+  updatePasswordHash(userId: string, passwordHash: string, expectedHash?: string): Promise<boolean>;
   
   // Message operations
   getMessages(limit?: number, offset?: number): Promise<MessageWithUser[]>;
-  createMessage(message: InsertMessage): Promise<Message>;
-  deleteMessage(messageId: number, userId: string): Promise<boolean>;
+  getMessagesPage(limit?: number, after?: MessageCursor): Promise<MessagePage>;
+  searchMessages(query: string, limit?: number, offset?: number): Promise<MessageSearchPage>;
+  isSearchTriggerInstalled(): Promise<boolean>;
+  createMessage(message: InsertMessage): Promise<MessageCreated>;
+  deleteMessage(messageId: number, userId: string): Promise<MessageDeleted | undefined>;
   getMessageCount(): Promise<number>;
   
   // Profile operations
   updateUserProfile(userId: string, data: UpdateProfile): Promise<void>;
   changePassword(userId: string, currentPassword: string, newPassword: string): Promise<boolean>;
   updateUserAvatar(userId: string, avatarUrl: string): Promise<void>;
+  isAvatarReferenced(avatarUrl: string): Promise<boolean>;
   
   // Admin operations
   getAllUsers(): Promise<User[]>;
@@ -41,10 +94,70 @@ export interface IStorage {
   deleteUser(userId: string): Promise<void>;
 }
 
+// Message columns returned to clients (see Message)
+const messageColumns = {
+  id: messages.id,
+  content: messages.content,
+  timestamp: messages.timestamp,
+  userId: messages.userId,
+};
+
+// A messages row as returned by the hand-written write statements below
+type MessageRow = {
+  id: number;
+  content: string;
+  timestamp: string;
+  user_id: string;
+};
+
+// The author columns createMessage returns alongside the row (see FeedAuthor)
+type CreatedMessageRow = MessageRow & {
+  username: string;
+  avatar_url: string | null;
+  profile_image_url: string | null;
+  role: number | null;
+  post_count: number | null;
+  total_count: string | null;
+};
+
+// Maps like Drizzle does for messages (the timestamp is selected as text)
+function toMessage(row: MessageRow): Message {
+  return {
+    id: row.id,
+    content: row.content,
+    timestamp: messages.timestamp.mapFromDriverValue(row.timestamp),
+    userId: row.user_id,
+  };
+}
+
+// Search ranks at most this many of the newest matches, so a common word
+// costs a short backward scan of IDX_messages_timestamp_id instead of
+// ranking every matching row
+const SEARCH_MAX_MATCHES = 1000;
+
+// Trigger that maintains messages.search_vector; must match TRIGGER_NAME in
+// message_search.py
+const SEARCH_TRIGGER_NAME = "messages_search_vector";
+
+// Columns selected for a message's author in the feed (see FeedAuthor)
+const feedAuthorColumns = {
+  username: users.username,
+  avatarUrl: users.avatarUrl,
+  profileImageUrl: users.profileImageUrl,
+  role: users.role,
+  postCount: users.postCount,
+};
+
 export class DatabaseStorage implements IStorage {
   // User operations (mandatory for Replit Auth)
+  // Served from userCache; every method that writes a users row invalidates it
   async getUser(id: string): Promise<User | undefined> {
+    const cached = userCache.get(id);
+    if (cached) return cached;
+
+    const epoch = userCache.currentEpoch();
     const [user] = await db.select().from(users).where(eq(users.id, id));
+    if (user) userCache.set(user, epoch);
     return user;
   }
 
@@ -63,6 +176,7 @@ export class DatabaseStorage implements IStorage {
         },
       })
       .returning();
+    userCache.invalidate(user.id);
     return user;
   }
 
@@ -78,7 +192,7 @@ export class DatabaseStorage implements IStorage {
   }
 
   async createUser(userData: InsertUser): Promise<User> {
-    const hashedPassword = await bcrypt.hash(userData.passwordHash!, 12);
+    const hashedPassword = await passwordHasher.hash(userData.passwordHash!);
     const [user] = await db
       .insert(users)
       .values({
@@ -101,62 +215,210 @@ export class DatabaseStorage implements IStorage {
         updatedAt: new Date(),
       })
       .where(eq(users.id, userId));
+    userCache.invalidate(userId);
+  }
+
+  // With expectedHash the write is a compare-and-swap: it only replaces that
+  // exact hash, so a background rehash cannot undo a concurrent password
+  // change. Returns whether a row was updated.
+  async updatePasswordHash(userId: string, passwordHash: string, expectedHash?: string): Promise<boolean> {
+    const updated = await db
+      .update(users)
+      .set({
+        passwordHash,
+        updatedAt: new Date(),
+      })
+      .where(
+        expectedHash === undefined
+          ? eq(users.id, userId)
+          : and(eq(users.id, userId), eq(users.passwordHash, expectedHash)),
+      )
+      .returning({ id: users.id });
+    userCache.invalidate(userId);
+    return updated.length > 0;
   }
 
   // Message operations
   async getMessages(limit: number = 20, offset: number = 0): Promise<MessageWithUser[]> {
     const result = await db
-      .select()
+      .select({ message: messageColumns, user: feedAuthorColumns })
       .from(messages)
       .leftJoin(users, eq(messages.userId, users.id))
-      .orderBy(desc(messages.timestamp))
+      .orderBy(desc(messages.timestamp), desc(messages.id))
       .limit(limit)
       .offset(offset);
 
     return result.map(row => ({
-      ...row.messages,
-      user: row.users!,
+      ...row.message,
+      user: row.user!,
     }));
   }
 
-  async createMessage(messageData: InsertMessage): Promise<Message> {
-    const [message] = await db
-      .insert(messages)
-      .values(messageData)
-      .returning();
-    
-    // Increment user post count
-    await this.updateUserPostCount(messageData.userId, 1);
-    
-    return message;
+  // Keyset pagination: seeks to the cursor through IDX_messages_timestamp_id
+  // instead of sorting and discarding rows, so every page costs the same.
+  async getMessagesPage(limit: number = 20, after?: MessageCursor): Promise<MessagePage> {
+    const rows = await db
+      .select({
+        message: messageColumns,
+        user: feedAuthorColumns,
+        sortTimestamp: sql<string>`${messages.timestamp}::text`,
+      })
+      .from(messages)
+      .leftJoin(users, eq(messages.userId, users.id))
+      .where(
+        after
+          ? sql`(${messages.timestamp}, ${messages.id}) < (${after.timestamp}::timestamp, ${after.id})`
+          : undefined,
+      )
+      .orderBy(desc(messages.timestamp), desc(messages.id))
+      .limit(limit + 1);
+
+    // The extra row only tells us whether another page exists
+    const page = rows.slice(0, limit);
+    const last = page[page.length - 1];
+    return {
+      messages: page.map(row => ({
+        ...row.message,
+        user: row.user!,
+      })),
+      nextCursor: rows.length > limit
+        ? encodeMessageCursor({ timestamp: last.sortTimestamp, id: last.message.id })
+        : null,
+    };
   }
 
-  async deleteMessage(messageId: number, userId: string): Promise<boolean> {
-    const [message] = await db
-      .select()
+  // Full-text search over IDX_messages_search_vector. query uses web search
+  // syntax ("quoted phrases", OR, -excluded); a query of only stop words
+  // matches nothing.
+  async searchMessages(query: string, limit: number = 20, offset: number = 0): Promise<MessageSearchPage> {
+    const tsquery = sql`websearch_to_tsquery('english', ${query})`;
+    const matches = db
+      .select({
+        id: messages.id,
+        rank: sql<number>`ts_rank_cd(${messages.searchVector}, ${tsquery})`.as("rank"),
+      })
       .from(messages)
-      .where(eq(messages.id, messageId));
+      .where(sql`${messages.searchVector} @@ ${tsquery}`)
+      .orderBy(desc(messages.timestamp), desc(messages.id))
+      .limit(SEARCH_MAX_MATCHES)
+      .as("matches");
 
-    if (!message) return false;
+    const rows = await db
+      .select({
+        message: messageColumns,
+        user: feedAuthorColumns,
+        rank: matches.rank,
+        matchCount: sql<number>`count(*) over ()`.mapWith(Number),
+      })
+      .from(matches)
+      .innerJoin(messages, eq(messages.id, matches.id))
+      .leftJoin(users, eq(messages.userId, users.id))
+      .orderBy(desc(matches.rank), desc(messages.id))
+      .limit(limit)
+      .offset(offset);
 
-    // Check if user owns the message or is admin
-    const user = await this.getUser(userId);
-    if (!user) return false;
+    const matchCount = rows.length > 0 ? rows[0].matchCount : 0;
+    return {
+      messages: rows.map(row => ({
+        ...row.message,
+        user: row.user!,
+        rank: row.rank,
+      })),
+      totalCount: matchCount,
+      capped: matchCount >= SEARCH_MAX_MATCHES,
+    };
+  }
 
-    const canDelete = message.userId === userId || user.role === 1;
-    if (!canDelete) return false;
+  // db:push creates search_vector but not the trigger that fills it, so
+  // search would silently miss every new message (see shared/schema.ts)
+  async isSearchTriggerInstalled(): Promise<boolean> {
+    const result = await db.execute<{ installed: boolean }>(sql`
+      SELECT EXISTS (
+        SELECT 1 FROM pg_trigger
+        WHERE tgrelid = 'messages'::regclass
+        AND tgname = ${SEARCH_TRIGGER_NAME} AND tgenabled <> 'D'
+      ) AS installed
+    `);
+    return result.rows[0].installed;
+  }
 
-    await db.delete(messages).where(eq(messages.id, messageId));
-    
-    // Decrement post count if user is deleting their own message
-    if (message.userId === userId) {
-      await this.updateUserPostCount(userId, -1);
-    }
-    
-    return true;
+  // Message writes are single statements: the row change and the author's
+  // post_count update commit together in one round trip, so a failure
+  // between them cannot leave the count wrong. They also return what the
+  // feed event needs, so publishing costs no further queries. The counter
+  // is read in the statement's snapshot, before its own trigger has run.
+  async createMessage(messageData: InsertMessage): Promise<MessageCreated> {
+    const result = await db.execute<CreatedMessageRow>(sql`
+      WITH inserted AS (
+        INSERT INTO messages (content, user_id)
+        VALUES (${messageData.content}, ${messageData.userId})
+        RETURNING id, content, timestamp, user_id
+      ), counted AS (
+        UPDATE users
+        SET post_count = COALESCE(post_count, 0) + 1, updated_at = now()
+        WHERE id = (SELECT user_id FROM inserted)
+        RETURNING username, avatar_url, profile_image_url, role, post_count
+      )
+      SELECT id, content, timestamp::text AS timestamp, user_id,
+             username, avatar_url, profile_image_url, role, post_count,
+             (SELECT sum(value) FROM ${counters} WHERE name = 'messages') + 1 AS total_count
+      FROM inserted, counted
+    `);
+    userCache.invalidate(messageData.userId);
+
+    const [row] = result.rows;
+    const author: FeedAuthor = {
+      username: row.username,
+      avatarUrl: row.avatar_url,
+      profileImageUrl: row.profile_image_url,
+      role: row.role,
+      postCount: row.post_count,
+    };
+    return {
+      message: { ...toMessage(row), user: author },
+      totalCount: row.total_count === null ? null : Number(row.total_count),
+    };
+  }
+
+  // The permission check (author or admin) is part of the DELETE, and the
+  // decrement goes to the author, also when an admin deletes the message.
+  // Of two concurrent deletes only one removes the row and decrements.
+  async deleteMessage(messageId: number, userId: string): Promise<MessageDeleted | undefined> {
+    const result = await db.execute<{ user_id: string; total_count: string | null }>(sql`
+      WITH deleted AS (
+        DELETE FROM messages
+        USING users deleter
+        WHERE messages.id = ${messageId}
+          AND deleter.id = ${userId}
+          AND (messages.user_id = deleter.id OR deleter.role = 1)
+        RETURNING messages.user_id
+      ), counted AS (
+        UPDATE users
+        SET post_count = COALESCE(post_count, 0) - 1, updated_at = now()
+        WHERE id IN (SELECT user_id FROM deleted)
+      )
+      SELECT user_id,
+             (SELECT sum(value) FROM ${counters} WHERE name = 'messages') - 1 AS total_count
+      FROM deleted
+    `);
+
+    const [deleted] = result.rows;
+    if (!deleted) return undefined;
+
+    userCache.invalidate(deleted.user_id);
+    return { totalCount: deleted.total_count === null ? null : Number(deleted.total_count) };
   }
 
   async getMessageCount(): Promise<number> {
+    // The count is spread over slots; no rows means no counter
+    const [counter] = await db
+      .select({ value: sql<number>`sum(${counters.value})`.mapWith(Number) })
+      .from(counters)
+      .where(eq(counters.name, "messages"))
+      .having(sql`count(*) > 0`);
+    if (counter) return counter.value;
+
+    // Counter not installed yet (python message_counter.py install)
     const [result] = await db.select({ count: count() }).from(messages);
     return result.count;
   }
@@ -170,6 +432,7 @@ export class DatabaseStorage implements IStorage {
         updatedAt: new Date(),
       })
       .where(eq(users.id, userId));
+    userCache.invalidate(userId);
   }
 
   async updateUserAvatar(userId: string, avatarUrl: string): Promise<void> {
@@ -180,6 +443,16 @@ export class DatabaseStorage implements IStorage {
         updatedAt: new Date(),
       })
       .where(eq(users.id, userId));
+    userCache.invalidate(userId);
+  }
+
+  async isAvatarReferenced(avatarUrl: string): Promise<boolean> {
+    const [user] = await db
+      .select({ id: users.id })
+      .from(users)
+      .where(eq(users.avatarUrl, avatarUrl))
+      .limit(1);
+    return !!user;
   }
 
   async changePassword(userId: string, currentPassword: string, newPassword: string): Promise<boolean> {
@@ -188,19 +461,13 @@ export class DatabaseStorage implements IStorage {
       return false;
     }
 
-    const isValidCurrentPassword = await bcrypt.compare(currentPassword, user.passwordHash);
+    const isValidCurrentPassword = await passwordHasher.compare(currentPassword, user.passwordHash);
     if (!isValidCurrentPassword) {
       return false;
     }
 
-    const newHashedPassword = await bcrypt.hash(newPassword, 12);
-    await db
-      .update(users)
-      .set({
-        passwordHash: newHashedPassword,
-        updatedAt: new Date(),
-      })
-      .where(eq(users.id, userId));
+    const newHashedPassword = await passwordHasher.hash(newPassword);
+    await this.updatePasswordHash(userId, newHashedPassword);
     
     return true;
   }
@@ -215,6 +482,7 @@ export class DatabaseStorage implements IStorage {
       .update(users)
       .set({ role, updatedAt: new Date() })
       .where(eq(users.id, userId));
+    userCache.invalidate(userId);
   }
 
   async deleteUser(userId: string): Promise<void> {
@@ -222,6 +490,7 @@ export class DatabaseStorage implements IStorage {
     await db.delete(messages).where(eq(messages.userId, userId));
     // Delete user
     await db.delete(users).where(eq(users.id, userId));
+    userCache.invalidate(userId);
   }
 }
 
@@ -0,0 +1,110 @@
+import type { User } from "@shared/schema";
+
+export interface UserCacheStats {
+  size: number;
+  maxEntries: number;
+  ttlMs: number;
+  hits: number;
+  misses: number;
+  hitRate: number;
+  evictions: number;
+  expirations: number;
+  invalidations: number;
+}
+
+interface Entry {
+  user: User;
+  expiresAt: number;
+}
+
+// Bounded LRU cache of user rows with a TTL. A Map keeps insertion order,
+// so re-inserting on every hit makes its first key the least recently used.
+//
+// The cache is per process: writes made elsewhere (another server instance,
+// the Python maintenance scripts) are only picked up once the TTL expires.
+//
+// Callers get their own shallow copy on both get() and set(). The users
+// returned become req.user and are handed to route code, so a mutation by
+// one request must not leak into the cached row every other request sees.
+export class UserCache {
+  private entries = new Map<string, Entry>();
+  // Bumped on every invalidation; fills that raced one are dropped
+  private epoch = 0;
+  private hits = 0;
+  private misses = 0;
+  private evictions = 0;
+  private expirations = 0;
+  private invalidations = 0;
+
+  constructor(
+    private readonly maxEntries: number,
+    private readonly ttlMs: number,
+  ) {}
+
+  get(id: string): User | undefined {
+    const entry = this.entries.get(id);
+    if (!entry) {
+      this.misses++;
+      return undefined;
+    }
+    if (entry.expiresAt <= Date.now()) {
+      this.entries.delete(id);
+      this.expirations++;
+      this.misses++;
+      return undefined;
+    }
+    this.entries.delete(id);
+    this.entries.set(id, entry);
+    this.hits++;
+    return { ...entry.user };
+  }
+
+  // Call before reading from the database and pass the result to set()
+  currentEpoch(): number {
+    return this.epoch;
+  }
+
+  set(user: User, epoch: number): void {
+    // An invalidation happened while the row was being read; it may be stale
+    if (epoch !== this.epoch) return;
+
+    this.entries.delete(user.id);
+    this.entries.set(user.id, { user: { ...user }, expiresAt: Date.now() + this.ttlMs });
+    while (this.entries.size > this.maxEntries) {
+      const oldest = this.entries.keys().next().value as string;
+      this.entries.delete(oldest);
+      this.evictions++;
+    }
+  }
+
+  invalidate(id: string): void {
+    this.epoch++;
+    this.invalidations++;
+    this.entries.delete(id);
+  }
+
+  clear(): void {
+    this.epoch++;
+    this.entries.clear();
+  }
+
+  stats(): UserCacheStats {
+    const lookups = this.hits + this.misses;
+    return {
+      size: this.entries.size,
+      maxEntries: this.maxEntries,
+      ttlMs: this.ttlMs,
+      hits: this.hits,
+      misses: this.misses,
+      hitRate: lookups ? this.hits / lookups : 0,
+      evictions: this.evictions,
+      expirations: this.expirations,
+      invalidations: this.invalidations,
+    };
+  }
+}
+
+export const userCache = new UserCache(
+  parseInt(process.env.USER_CACHE_MAX_ENTRIES || "10000", 10),
+  parseInt(process.env.USER_CACHE_TTL_MS || "60000", 10),
+);
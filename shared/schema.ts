@@ -7,7 +7,11 @@ import {
   varchar,
   text,
   integer,
+  smallint,
+  bigint,
   boolean,
+  customType,
+  primaryKey,
 } from "drizzle-orm/pg-core";
 import { relations } from "drizzle-orm";
 import { createInsertSchema } from "drizzle-zod";
@@ -43,14 +47,58 @@ export const users = pgTable("users", {
   updatedAt: timestamp("updated_at").defaultNow(),
 });
 
-// Messages table
-export const messages = pgTable("messages", {
-  id: integer("id").primaryKey().generatedByDefaultAsIdentity(),
-  content: text("content").notNull(),
-  timestamp: timestamp("timestamp").defaultNow(),
-  userId: varchar("user_id").notNull().references(() => users.id),
+const tsvector = customType<{ data: string }>({
+  dataType() {
+    return "tsvector";
+  },
 });
 
+// Messages table.
+//
+// Full-text search needs more than db:push creates. Set it up in this order:
+//   1. npm run db:push                   tables, search_vector column, indexes
+//   2. python message_search.py install  trigger that fills search_vector,
+//                                        backfill of existing rows
+// Without step 2 new messages never match a search; the server logs a
+// warning at startup when the trigger is missing. On a large existing table
+// run step 2 first, so the GIN index is built CONCURRENTLY instead of by
+// db:push's blocking CREATE INDEX.
+export const messages = pgTable(
+  "messages",
+  {
+    id: integer("id").primaryKey().generatedByDefaultAsIdentity(),
+    content: text("content").notNull(),
+    timestamp: timestamp("timestamp").defaultNow(),
+    userId: varchar("user_id").notNull().references(() => users.id),
+    // to_tsvector('english', content), kept current by a trigger rather than
+    // GENERATED ALWAYS so large tables can be backfilled in batches
+    // (installed and backfilled by message_search.py)
+    searchVector: tsvector("search_vector"),
+  },
+  (table) => [
+    // Feed order; a backward scan serves ORDER BY timestamp DESC, id DESC
+    index("IDX_messages_timestamp_id").on(table.timestamp, table.id),
+    // Foreign keys are not indexed automatically; deleteUser removes by user_id
+    index("IDX_messages_user_id").on(table.userId),
+    // Full-text search; message_search.py builds it CONCURRENTLY
+    index("IDX_messages_search_vector").using("gin", table.searchVector),
+  ],
+);
+
+// Maintained row counts, kept exact by statement-level triggers on the
+// counted table (installed and verified by message_counter.py). Each count
+// is spread over several slots so concurrent writers do not share one row
+// lock; the count is the sum of a name's slots.
+export const counters = pgTable(
+  "counters",
+  {
+    name: varchar("name", { length: 64 }).notNull(),
+    slot: smallint("slot").notNull().default(0),
+    value: bigint("value", { mode: "number" }).notNull().default(0),
+  },
+  (table) => [primaryKey({ name: "counters_pkey", columns: [table.name, table.slot] })],
+);
+
 // Relations
 export const usersRelations = relations(users, ({ many }) => ({
   messages: many(messages),
@@ -99,10 +147,38 @@ export type UpsertUser = z.infer<typeof upsertUserSchema>;
 export type User = typeof users.$inferSelect;
 export type InsertUser = z.infer<typeof insertUserSchema>;
 export type UpdateProfile = z.infer<typeof updateProfileSchema>;
-export type Message = typeof messages.$inferSelect;
+// search_vector is internal to full-text search and never sent to clients
+export type Message = Omit<typeof messages.$inferSelect, "searchVector">;
 export type InsertMessage = z.infer<typeof insertMessageSchema>;
 
+// Author fields the feed renders; credentials and contact details stay out
+export type FeedAuthor = Pick<
+  User,
+  "username" | "avatarUrl" | "profileImageUrl" | "role" | "postCount"
+>;
+
 // Message with user data
 export type MessageWithUser = Message & {
-  user: User;
+  user: FeedAuthor;
+};
+
+// Pushed over GET /api/messages/stream. totalCount is the count after the
+// change; resync means events may have been missed and the page is stale.
+export type FeedEvent =
+  | { type: "message.created"; message: MessageWithUser; totalCount: number }
+  | { type: "message.deleted"; id: number; totalCount: number }
+  | { type: "resync" };
+
+// One page of GET /api/messages/search, best match first. Only the newest
+// matches are ranked (see searchMessages); capped says older ones may exist.
+export type MessageSearchPage = {
+  messages: (MessageWithUser & { rank: number })[];
+  totalCount: number;
+  capped: boolean;
+};
+
+// One page of the feed in cursor mode; nextCursor is null on the last page
+export type MessagePage = {
+  messages: MessageWithUser[];
+  nextCursor: string | null;
 };
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Write-contention load generator for the message write path.
+
+Simulates N concurrent posters on a thread pool, each on its own pooled
+connection, issuing the same statements as DatabaseStorage.createMessage
+(and optionally deleteMessage). Authors are drawn with a Zipf-like skew
+from the most active users, so a few users.post_count rows become lock
+hotspots the way they do in production.
+
+--write-path picks the statements: cte (default) is the current
+single-statement write path, legacy the earlier sequence of separate
+statements, kept so the two can be compared on the same data.
+
+Reports throughput, p50/p99 latency per operation and per statement, and
+lock-wait time sampled from pg_stat_activity. Messages written by the run
+are removed afterwards (with their post_count increments) unless --keep
+is given.
+
+Usage:
+    python write_load.py [--workers 16] [--duration 30] [--authors 100]
+                         [--skew 1.1] [--delete-ratio 0.0] [--transaction]
+                         [--write-path cte|legacy]
+                         [--output results.json] [--keep]
+"""
+
+import sys
+import json
+import time
+import argparse
+import threading
+from collections import Counter, defaultdict
+import numpy as np
+import psycopg2
+from db_session import DatabaseSession, close_pool, get_pool
+
+# Marks messages written by this tool so they can be cleaned up
+CONTENT_PREFIX = 'write_load:'
+
+# application_name of worker connections, used to find them in pg_stat_activity
+APPLICATION_NAME = 'write_load'
+
+# How often the monitor samples waiting backends
+SAMPLE_INTERVAL = 0.05
+
+DEFAULT_WORKERS = 16
+DEFAULT_DURATION = 30
+DEFAULT_AUTHORS = 100
+DEFAULT_SKEW = 1.1
+
+def load_authors(session, count):
+    """Return user ids ordered from most to least active."""
+    session.cur.execute("""
+        SELECT id FROM users
+        ORDER BY post_count DESC NULLS LAST, id
+        LIMIT %s
+    """, (count,))
+    return [row[0] for row in session.cur.fetchall()]
+
+def author_weights(count, skew):
+    """Zipf-like weights: the author at rank r posts in proportion to 1 / r**skew."""
+    weights = 1.0 / np.arange(1, count + 1) ** skew
+    return weights / weights.sum()
+
+class Timings:
+    """Latency samples per label, shared by all workers."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = Counter()
+
+    def record(self, local):
+        with self.lock:
+            for label, values in local.items():
+                self.samples[label].extend(values)
+
+    def summary(self, elapsed):
+        result = {}
+        for label, values in sorted(self.samples.items()):
+            ms = np.array(values) * 1000
+            result[label] = {
+                'count': len(values),
+                'per_sec': len(values) / elapsed,
+                'p50_ms': float(np.percentile(ms, 50)),
+                'p99_ms': float(np.percentile(ms, 99)),
+                'max_ms': float(ms.max()),
+            }
+        return result
+
+def create_message_cte(cur, author_id, content):
+    """INSERT plus post_count UPDATE in one statement, as DatabaseStorage.createMessage does."""
+    timings = {}
+    started = time.perf_counter()
+    cur.execute("""
+        WITH inserted AS (
+            INSERT INTO messages (content, user_id) VALUES (%s, %s)
+            RETURNING id, content, timestamp, user_id
+        ), counted AS (
+            UPDATE users
+            SET post_count = COALESCE(post_count, 0) + 1, updated_at = now()
+            WHERE id = (SELECT user_id FROM inserted)
+            RETURNING username, avatar_url, profile_image_url, role, post_count
+        )
+        SELECT id, content, timestamp::text AS timestamp, user_id,
+               username, avatar_url, profile_image_url, role, post_count,
+               (SELECT sum(value) FROM counters WHERE name = 'messages') + 1 AS total_count
+        FROM inserted, counted
+    """, (content, author_id))
+    message_id = cur.fetchone()[0]
+    timings['insert + post_count'] = time.perf_counter() - started
+    return message_id, timings
+
+def delete_message_cte(cur, message_id, user_id):
+    """Checked DELETE plus decrement in one statement, as deleteMessage does."""
+    timings = {}
+    started = time.perf_counter()
+    cur.execute("""
+        WITH deleted AS (
+            DELETE FROM messages
+            USING users deleter
+            WHERE messages.id = %s
+              AND deleter.id = %s
+              AND (messages.user_id = deleter.id OR deleter.role = 1)
+            RETURNING messages.user_id
+        ), counted AS (
+            UPDATE users
+            SET post_count = COALESCE(post_count, 0) - 1, updated_at = now()
+            WHERE id IN (SELECT user_id FROM deleted)
+        )
+        SELECT user_id,
+               (SELECT sum(value) FROM counters WHERE name = 'messages') - 1 AS total_count
+        FROM deleted
+    """, (message_id, user_id))
+    cur.fetchall()
+    timings['delete + post_count'] = time.perf_counter() - started
+    return timings
+
+def create_message_legacy(cur, author_id, content):
+    """INSERT then a separate post_count UPDATE, the pre-CTE createMessage."""
+    timings = {}
+    started = time.perf_counter()
+    cur.execute("""
+        INSERT INTO messages (content, user_id) VALUES (%s, %s)
+        RETURNING id, content, timestamp, user_id
+    """, (content, author_id))
+    message_id = cur.fetchone()[0]
+    inserted = time.perf_counter()
+    cur.execute("""
+        UPDATE users SET post_count = post_count + %s, updated_at = %s
+        WHERE id = %s
+    """, (1, time.strftime('%Y-%m-%d %H:%M:%S'), author_id))
+    timings['insert'] = inserted - started
+    timings['update post_count'] = time.perf_counter() - inserted
+    return message_id, timings
+
+def delete_message_legacy(cur, message_id, user_id):
+    """Select, permission check, DELETE, then decrement, the pre-CTE deleteMessage."""
+    timings = {}
+    started = time.perf_counter()
+    cur.execute("SELECT id, content, timestamp, user_id FROM messages WHERE id = %s",
+                (message_id,))
+    message = cur.fetchone()
+    cur.execute("SELECT id, role FROM users WHERE id = %s", (user_id,))
+    cur.fetchone()
+    selected = time.perf_counter()
+    if message is None:
+        return timings
+    cur.execute("DELETE FROM messages WHERE id = %s", (message_id,))
+    deleted = time.perf_counter()
+    cur.execute("""
+        UPDATE users SET post_count = post_count + %s, updated_at = %s
+        WHERE id = %s
+    """, (-1, time.strftime('%Y-%m-%d %H:%M:%S'), user_id))
+    timings['select'] = selected - started
+    timings['delete'] = deleted - selected
+    timings['update post_count'] = time.perf_counter() - deleted
+    return timings
+
+# (create, delete) statement functions per --write-path
+WRITE_PATHS = {
+    'cte': (create_message_cte, delete_message_cte),
+    'legacy': (create_message_legacy, delete_message_legacy),
+}
+
+def run_worker(worker_id, authors, weights, args, deadline, timings):
+    """Post (and delete) messages until the deadline."""
+    rng = np.random.default_rng(args.seed + worker_id if args.seed is not None else None)
+    local = defaultdict(list)
+    own_messages = []
+    create_message, delete_message = WRITE_PATHS[args.write_path]
+    conn = get_pool().getconn()
+    try:
+        # DatabaseStorage runs each write in autocommit (one statement on the
+        # cte path); --transaction wraps each operation in BEGIN/COMMIT
+        conn.autocommit = not args.transaction
+        with conn.cursor() as cur:
+            cur.execute("SET application_name = %s", (APPLICATION_NAME,))
+            sequence = 0
+            while time.perf_counter() < deadline:
+                sequence += 1
+                try:
+                    started = time.perf_counter()
+                    if own_messages and rng.random() < args.delete_ratio:
+                        message_id, author_id = own_messages.pop(rng.integers(len(own_messages)))
+                        statements = delete_message(cur, message_id, author_id)
+                        label = 'deleteMessage'
+                    else:
+                        author_id = authors[rng.choice(len(authors), p=weights)]
+                        content = f"{CONTENT_PREFIX} worker {worker_id} message {sequence}"
+                        message_id, statements = create_message(cur, author_id, content)
+                        own_messages.append((message_id, author_id))
+                        label = 'createMessage'
+                    if args.transaction:
+                        conn.commit()
+                    local[label].append(time.perf_counter() - started)
+                    for statement, seconds in statements.items():
+                        local[f"{label}: {statement}"].append(seconds)
+                except psycopg2.Error as e:
+                    if args.transaction:
+                        conn.rollback()
+                    with timings.lock:
+                        timings.errors[type(e).__name__] += 1
+    finally:
+        conn.autocommit = False
+        get_pool().putconn(conn)
+        timings.record(local)
+
+def monitor_lock_waits(stop, stats):
+    """Sample how many worker backends are waiting on locks."""
+    conn = get_pool().getconn()
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            while not stop.is_set():
+                cur.execute("""
+                    SELECT wait_event, count(*)
+                    FROM pg_stat_activity
+                    WHERE application_name = %s AND wait_event_type = 'Lock'
+                    GROUP BY wait_event
+                """, (APPLICATION_NAME,))
+                stats['samples'] += 1
+                for wait_event, waiting in cur.fetchall():
+                    # Each waiting backend accounts for one interval of wait time
+                    stats['wait_seconds'][wait_event] += waiting * SAMPLE_INTERVAL
+                stop.wait(SAMPLE_INTERVAL)
+    finally:
+        conn.autocommit = False
+        get_pool().putconn(conn)
+
+def cleanup(session):
+    """Delete the run's messages and undo their post_count increments."""
+    session.cur.execute("""
+        WITH removed AS (
+            DELETE FROM messages WHERE content LIKE %s
+            RETURNING user_id
+        ), per_user AS (
+            SELECT user_id, count(*) AS removed FROM removed GROUP BY user_id
+        )
+        UPDATE users u
+        SET post_count = COALESCE(u.post_count, 0) - p.removed
+        FROM per_user p
+        WHERE u.id = p.user_id
+    """, (CONTENT_PREFIX + '%',))
+    print(f"Removed this run's messages from {session.cur.rowcount:,} authors")
+
+def main():
+    """Parse command-line options and run the load test."""
+    parser = argparse.ArgumentParser(description="Generate concurrent message writes and measure contention.")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f"concurrent posters (default: {DEFAULT_WORKERS})")
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION,
+                        help=f"seconds to run (default: {DEFAULT_DURATION})")
+    parser.add_argument('--authors', type=int, default=DEFAULT_AUTHORS,
+                        help=f"distinct authors, most active first (default: {DEFAULT_AUTHORS})")
+    parser.add_argument('--skew', type=float, default=DEFAULT_SKEW,
+                        help=f"Zipf exponent of author choice; 0 is uniform (default: {DEFAULT_SKEW})")
+    parser.add_argument('--delete-ratio', type=float, default=0.0,
+                        help="fraction of operations that delete one of the worker's posts")
+    parser.add_argument('--transaction', action='store_true',
+                        help="wrap each operation in an explicit transaction instead of autocommit")
+    parser.add_argument('--write-path', choices=sorted(WRITE_PATHS), default='cte',
+                        help="cte: single-statement writes as DatabaseStorage issues them "
+                             "(default); legacy: the earlier separate statements")
+    parser.add_argument('--seed', type=int, help="random seed for reproducible author choice")
+    parser.add_argument('--output', help="write results as JSON to this file")
+    parser.add_argument('--keep', action='store_true',
+                        help="keep the generated messages instead of removing them")
+    args = parser.parse_args()
+
+    print("Write Contention Load Test")
+    print("=" * 40)
+
+    # Workers plus the lock monitor and the setup/cleanup session
+    get_pool(maxconn=args.workers + 2)
+    try:
+        with DatabaseSession() as session:
+            authors = load_authors(session, args.authors)
+        if not authors:
+            print("No users found. Seed the database first (python seed_data.py)")
+            sys.exit(1)
+
+        weights = author_weights(len(authors), args.skew)
+        print(f"Write path: {args.write_path}")
+        print(f"{args.workers} workers, {len(authors)} authors "
+              f"(top author gets {weights[0]:.1%} of posts), {args.duration:g}s, "
+              f"{'explicit transaction per operation' if args.transaction else 'autocommit statements'}")
+
+        timings = Timings()
+        lock_stats = {'samples': 0, 'wait_seconds': Counter()}
+        stop = threading.Event()
+        monitor = threading.Thread(target=monitor_lock_waits, args=(stop, lock_stats))
+        monitor.start()
+
+        started = time.perf_counter()
+        deadline = started + args.duration
+        workers = [
+            threading.Thread(target=run_worker,
+                             args=(worker_id, authors, weights, args, deadline, timings))
+            for worker_id in range(args.workers)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        monitor.join()
+
+        if not args.keep:
+            with DatabaseSession() as session:
+                cleanup(session)
+    except psycopg2.Error as e:
+        print(f"Database error: {e}")
+        sys.exit(1)
+    finally:
+        close_pool()
+
+    summary = timings.summary(elapsed)
+    print(f"{'operation':<36} {'count':>8} {'ops/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for label, stats in summary.items():
+        print(f"{label:<36} {stats['count']:>8,} {stats['per_sec']:>9,.0f} "
+              f"{stats['p50_ms']:>8.2f} {stats['p99_ms']:>8.2f}")
+
+    total_wait = sum(lock_stats['wait_seconds'].values())
+    print(f"Lock wait: {total_wait:.2f}s across workers "
+          f"({total_wait / (elapsed * args.workers):.1%} of worker time)")
+    for wait_event, seconds in lock_stats['wait_seconds'].most_common():
+        print(f"  {wait_event}: {seconds:.2f}s")
+    for error, count in timings.errors.items():
+        print(f"Errors: {count:,} x {error}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'config': vars(args),
+                'write_path': args.write_path,
+                'elapsed': elapsed,
+                'operations': summary,
+                'lock_wait_seconds': dict(lock_stats['wait_seconds']),
+                'lock_wait_samples': lock_stats['samples'],
+                'errors': dict(timings.errors),
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()